@@ -1,8 +1,4 @@
 import PySimpleGUI as sg
-import pyautogui
-import pytesseract
-import cv2
-import numpy as np
 import json
 import os
 import threading
@@ -10,30 +6,41 @@ import time
 import win32gui
 import win32api
 import win32con
-import keyboard
 import logging
 import tkinter as tk
-from PIL import ImageGrab, ImageTk
-from typing import Dict, List, Tuple, Optional
+from typing import List, Tuple, Optional
 from dataclasses import dataclass, asdict
-import re 
 from threading import Lock
 from shared_config import apply_theme
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+from frame_source import FrameSource, union_region
+from engine_service import EngineService, get_engine_service
+from screen_settle import SettleDetector, region_signature
+from timing_controller import TimingController
+from text_roi import TextRoiCache
+from preprocess import PreprocessConfig, PreprocessPipeline
+from text_scan import scan_for_result, scan_for_results_batch
+from ocr_engine import OcrResult
+from status_channel import STATUS_EVENT, OutputConsole, StatusChannel
+from instrumentation import Metrics, format_stats
+from logging_setup import setup_logging
+from kill_switch import KILL_EVENT, KillSwitch
 
 CONFIG_FILE = 'restock_config.json'
 
-# Set up logging
-logging.basicConfig(filename='restock_assistant.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
 
 @dataclass
 class RestockConfig:
     restock_button: Tuple[int, int]
     scan_regions: List[Tuple[int, int, int, int]]  # List of 8 scan regions
     target_words: List[str] = None  # Changed from target_word to target_words
+    batch_ocr: bool = False  # OCR all slots in one pass over a tiled image; slot texts may differ from per-slot OCR
+    wait_for_settle: bool = True  # End each loop once the vendor slots stop changing
+    adaptive_timing: bool = True  # Shrink that wait toward the measured screen latency
+    crop_text_lines: bool = False  # OCR only the text lines found inside each slot
+    preprocess: dict = None  # PreprocessConfig fields: upscale, denoise, invert
+    ocr_config: str = ''  # Tesseract options, e.g. '--psm 7'; written by ocr_tuner.py
+    min_confidence: float = 0.0  # Words OCR'd below this confidence (0-100) are ignored when matching
+    rescan_confidence: float = 0.0  # Slots with a word below this are read again with other preprocessing, 0 never
 
     def __post_init__(self):
         if self.target_words is None:
@@ -55,7 +62,9 @@ def load_config() -> RestockConfig:
             default_config_dict.update(config_dict)
             
             # Remove any unexpected keys
-            valid_keys = {'restock_button', 'scan_regions', 'target_words'}
+            valid_keys = {'restock_button', 'scan_regions', 'target_words', 'batch_ocr',
+                          'wait_for_settle', 'adaptive_timing', 'crop_text_lines', 'preprocess', 'ocr_config',
+                          'min_confidence', 'rescan_confidence'}
             default_config_dict = {k: v for k, v in default_config_dict.items() if k in valid_keys}
             
             return RestockConfig(**default_config_dict)
@@ -64,79 +73,95 @@ def load_config() -> RestockConfig:
     return default_config
 
 class RestockProcess(threading.Thread):
-    def __init__(self, config: RestockConfig, window: sg.Window):
+    def __init__(self, config: RestockConfig, status: StatusChannel,
+                 frame_source: Optional[FrameSource] = None, engine: Optional[EngineService] = None):
         super().__init__()
         self.config = config
-        self.window = window
+        self.status = status
+        self.engine = engine or get_engine_service()
+        self.frame_source = frame_source or self.engine.frame_source
+        self.input = self.engine.input
+        self.matcher = self.engine.matcher([word.strip() for word in config.target_words])
+        self.metrics = self.engine.instrument(Metrics('barter'))
         self.stop_event = threading.Event()
+        self.settle = SettleDetector(self.frame_source, config.wait_for_settle,
+                                     stop_event=self.stop_event)
+        self.timing = TimingController('barter', self.settle, config.adaptive_timing, self.metrics)
+        self.watch_region = union_region(config.scan_regions)
+        self.text_roi = TextRoiCache() if config.crop_text_lines else None
+        self.pipeline = PreprocessPipeline(PreprocessConfig.from_dict(config.preprocess))
+        self.rescan_pipeline = PreprocessPipeline(self.pipeline.config.variant()) \
+            if config.rescan_confidence > 0 else None
+        # Word confidences cost an image_to_data read, only taken when something uses them
+        self.read_words = config.min_confidence > 0 or self.rescan_pipeline is not None
         self.keyboard_lock = Lock()
 
     def run(self) -> None:
         while not self.stop_event.is_set():
             try:
-                found_target = False
-                
-                # Check each region for any of the target words
-                for region_index, region in enumerate(self.config.scan_regions):
-                    scanned_text = scan_for_text(region)
-                    self.window.write_event_value('-UPDATE-', 
-                        f"Scanning region {region_index + 1}: {scanned_text}")
-                    
-                    # Check each target word
-                    for target_word in self.config.target_words:
-                        if self.flexible_match(target_word.strip(), scanned_text):
-                            # Right click at the center of the specific region where word was found
-                            x = region[0] + region[2] // 2
-                            y = region[1] + region[3] // 2
-                            pyautogui.rightClick(x, y)
-                            self.window.write_event_value('-UPDATE-', 
-                                f"Found '{target_word}' in region {region_index + 1}")
-                            found_target = True
-                            break
-                    
-                    if found_target:
-                        break
-                
-                if not found_target:
-                    click_button(*self.config.restock_button)
-                    self.window.write_event_value('-UPDATE-', "Clicked Restock button")
-                
-                time.sleep(1)
+                with self.metrics.span('cycle'):
+                    self.run_cycle()
+                self.metrics.count('cycles')
             except Exception as e:
                 logging.error(f"Error in restock process: {e}")
-                self.window.write_event_value('-UPDATE-', f"Error occurred: {e}")
-                time.sleep(5)
-
-    def flexible_match(self, target: str, text: str) -> bool:
-        target = target.lower()
-        text = text.lower()
-        
-        def normalize_spaces(s: str) -> str:
-            return re.sub(r'\s+', ' ', s).strip()
-        
-        target = normalize_spaces(target)
-        text = normalize_spaces(text)
+                self.status.post(f"Error occurred: {e}")
+                self.stop_event.wait(5)
+        self.timing.save()
+
+    def run_cycle(self) -> None:
+        found_target = False
+        # One grab covers all 8 slots so they are read from the same instant
+        with self.metrics.span('capture'):
+            frame = self.frame_source.grab(self.config.scan_regions)
+        min_confidence = self.config.min_confidence
+        if frame is None:
+            results = [OcrResult("")] * len(self.config.scan_regions)
+        elif self.config.batch_ocr:
+            results = scan_for_results_batch(self.config.scan_regions, frame, self.engine.ocr, self.text_roi,
+                                             self.pipeline, self.config.ocr_config, self.metrics,
+                                             self.config.rescan_confidence, self.rescan_pipeline, self.read_words)
+        else:
+            # Slots are OCR'd concurrently; results stop at the first slot with a match
+            results, _ = self.engine.scheduler.first_hit(
+                self.config.scan_regions,
+                lambda region: scan_for_result(region, frame, self.engine.ocr, self.text_roi, self.pipeline,
+                                               self.config.ocr_config, self.metrics,
+                                               self.config.rescan_confidence, self.rescan_pipeline,
+                                               self.read_words),
+                lambda result: self.matcher.first_match(result.trusted_text(min_confidence)) is not None,
+                self.stop_event)
+        if self.stop_event.is_set():
+            return  # Stopped while the slots were being read, click nothing
+        scanned_texts = [result.trusted_text(min_confidence) for result in results]
         
-        target_words = target.split()
-        
-        def partial_word_match(word: str, text: str) -> bool:
-            if word in text:
-                return True
+        # Check each region for any of the target words
+        for region_index, scanned_text in enumerate(scanned_texts):
+            region = self.config.scan_regions[region_index]
+            self.status.post(f"Scanning region {region_index + 1}: {scanned_text}")
             
-            min_match_length = max(3, len(word) // 2)
-            for i in range(len(text) - min_match_length + 1):
-                if text[i:i+min_match_length] in word:
-                    return True
-            return False
-        
-        text_words = text.split()
-        matched_words = set()
+            # All target words are checked in one pass over the text
+            with self.metrics.span('match'):
+                target_word = self.matcher.first_match(scanned_text)
+            if target_word is not None:
+                # Right click at the center of the specific region where word was found
+                x = region[0] + region[2] // 2
+                y = region[1] + region[3] // 2
+                with self.metrics.span('click'):
+                    self.input.click(x, y, 'right', stop_event=self.stop_event)
+                self.status.post(f"Found '{target_word}' in region {region_index + 1}")
+                found_target = True
+                break
         
-        for target_word in target_words:
-            if any(partial_word_match(target_word, text_word) for text_word in text_words):
-                matched_words.add(target_word)
+        if not found_target:
+            with self.metrics.span('click'):
+                self.input.click(*self.config.restock_button, stop_event=self.stop_event)
+            self.status.post("Clicked Restock button")
         
-        return len(matched_words) == len(target_words)
+        # Wait for the slots to redraw, at most the old fixed 1 second
+        reference = region_signature(frame.image) if frame is not None else None
+        with self.metrics.span('wait'):
+            self.timing.wait('restock' if not found_target else 'buy', self.watch_region, 1.0, reference)
+
 
     def stop(self) -> None:
         with self.keyboard_lock:
@@ -179,9 +204,11 @@ def create_main_window(config: RestockConfig) -> sg.Window:
         [sg.Button("Save Configuration", font=('Helvetica', 12)), 
          sg.Button("Start Process", font=('Helvetica', 12)), 
          sg.Button("Stop Process", font=('Helvetica', 12)), 
+         sg.Button("Export Stats", font=('Helvetica', 12)), 
          sg.Button("Exit", font=('Helvetica', 12))],
         [sg.Multiline(size=(70, 10), key='OUTPUT', disabled=True, 
-                     font=('Courier', 11))]
+                     font=('Courier', 11))],
+        [sg.Text("", key='STATS', font=('Courier', 9), size=(70, 11))]
     ])
     
     return sg.Window("Restock Helper", 
@@ -198,30 +225,6 @@ def validate_config(config: RestockConfig) -> bool:
         return False
     return True
 
-def capture_screen_region(region: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
-    try:
-        screenshot = pyautogui.screenshot(region=region)
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    except Exception as e:
-        logging.error(f"Error capturing screen region: {e}")
-        return None
-
-def preprocess_image(image: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-
-def scan_for_text(region: Tuple[int, int, int, int]) -> str:
-    image = capture_screen_region(region)
-    if image is None:
-        return ""
-    processed_image = preprocess_image(image)
-    try:
-        text = pytesseract.image_to_string(processed_image)
-        return text.strip()
-    except Exception as e:
-        logging.error(f"Error scanning for text: {e}")
-        return ""
-
 def get_mouse_click() -> Tuple[int, int]:
     while True:
         if win32api.GetAsyncKeyState(0x01) & 0x8000:  # Left mouse button
@@ -302,23 +305,20 @@ def save_config(config: RestockConfig) -> None:
         json.dump(asdict(config), f)
     logging.info("Configuration saved successfully.")
 
-def click_button(x: int, y: int) -> None:
-    """Click at the specified coordinates."""
-    try:
-        pyautogui.click(x, y)
-        time.sleep(0.1)  # Small delay after clicking
-    except Exception as e:
-        logging.error(f"Error clicking button at ({x}, {y}): {e}")
-
-def main():
+def main(engine: Optional[EngineService] = None):
+    setup_logging('barter')
     apply_theme()
     config = load_config()
     window = create_main_window(config)
+    console = OutputConsole(window['OUTPUT'])
+    status = StatusChannel(window)
+    kill_switch = KillSwitch(window)
+    metrics = None  # Stats of the latest run, kept after it stops
+    kill_switch.start()
     restock_process = None
-    keyboard_lock = Lock()  # Add lock for thread safety
 
     while True:
-        event, values = window.read(timeout=100)  # Add timeout for more responsive keyboard checking
+        event, values = window.read()
         if event == sg.WINDOW_CLOSED or event == "Exit":
             break
         elif event.startswith('GET_'):
@@ -343,47 +343,52 @@ def main():
                 new_config = RestockConfig(
                     restock_button=tuple(map(int, values['RESTOCK'].split(','))),
                     scan_regions=scan_regions,
-                    target_words=values['TARGET_WORDS'].split(',')
+                    target_words=values['TARGET_WORDS'].split(','),
+                    batch_ocr=config.batch_ocr,
+                    wait_for_settle=config.wait_for_settle,
+                    adaptive_timing=config.adaptive_timing,
+                    crop_text_lines=config.crop_text_lines,
+                    preprocess=config.preprocess,
+                    ocr_config=config.ocr_config,
+                    min_confidence=config.min_confidence,
+                    rescan_confidence=config.rescan_confidence
                 )
                 if validate_config(new_config):
                     save_config(new_config)
                     config = new_config
-                    window['OUTPUT'].print("Configuration saved successfully.")
+                    console.print("Configuration saved successfully.")
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
             except ValueError:
-                window['OUTPUT'].print("Invalid input. Please check all fields.")
+                console.print("Invalid input. Please check all fields.")
         elif event == "Start Process":
             if restock_process is None or not restock_process.is_alive():
                 if validate_config(config):
-                    restock_process = RestockProcess(config, window)
+                    restock_process = RestockProcess(config, status, engine=engine)
+                    kill_switch.arm(restock_process.stop_event)
+                    metrics = restock_process.metrics
                     restock_process.start()
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
         elif event == "Stop Process":
             if restock_process and restock_process.is_alive():
                 restock_process.stop()
                 restock_process.join()
-                window['OUTPUT'].print("Process stopped.")
-        elif event == '-UPDATE-':
-            window['OUTPUT'].print(values['-UPDATE-'])
-        
-        # Modified keyboard check
-        try:
-            with keyboard_lock:
-                if keyboard.is_pressed('p'):
-                    if restock_process and restock_process.is_alive():
-                        restock_process.stop()
-                        restock_process.join(timeout=1.0)  # Add timeout to prevent hanging
-                        if restock_process.is_alive():
-                            # Force terminate if process doesn't stop gracefully
-                            restock_process.join()
-                        window['OUTPUT'].print("Process terminated by user (P key pressed)")
-                        restock_process = None
-                    time.sleep(0.1)  # Prevent multiple triggers
-        except Exception as e:
-            logging.error(f"Error in keyboard handling: {e}")
-            window['OUTPUT'].print(f"Error in keyboard handling: {e}")
+                console.print("Process stopped.")
+        elif event == STATUS_EVENT:
+            console.write(status.drain())
+            if metrics is not None:
+                window['STATS'].update(format_stats(metrics.snapshot()))
+        elif event == "Export Stats":
+            path = metrics.export() if metrics is not None else None
+            console.print(f"Stats exported to {path}" if path else "No stats to export yet.")
+        elif event == KILL_EVENT:
+            # The hotkey hook already stopped the process, only wait for it to finish
+            if restock_process:
+                restock_process.join()
+                stopped_ms = (time.perf_counter() - kill_switch.pressed_at) * 1000
+                console.print(f"Process terminated by user (P key pressed), stopped in {stopped_ms:.0f} ms")
+                restock_process = None
 
     # Cleanup when closing
     try:
@@ -393,6 +398,8 @@ def main():
     except Exception as e:
         logging.error(f"Error during cleanup: {e}")
 
+    kill_switch.close()
+    status.close()
     window.close()
 
 if __name__ == "__main__":
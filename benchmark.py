@@ -0,0 +1,495 @@
+import cv2
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+# replay goes first, it stands in for the desktop-only modules the others import
+from replay import (FIXTURES_DIR, Fixture, InstantSettle, LabelResponder, ReplayFrameSource, StatusRecorder,
+                    configure_ocr, import_tool, load_recorded_fixture, summarize, text_fixtures)
+from frame_source import FrameSource, union_region
+from input_backend import InputDevice, RecordingBackend
+from ocr_engine import get_ocr_engine
+from matcher import compile_targets, reference_flexible_match
+from text_roi import TextRoiCache, find_text_lines
+from preprocess import PreprocessConfig, PreprocessPipeline, preprocess_image
+from text_scan import scan_for_text, scan_for_text_batch
+from template_matching import scale_range
+
+BASELINE_FILE = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.2  # Relative p50 slowdown reported as a regression
+NOISE_FLOOR_MS = 0.05  # Differences below this are timer noise
+STARTUP_TARGET_MS = 1000.0  # Launcher time to first window
+STOP_TARGET_MS = 10.0  # Kill switch to worker exit
+
+# Cold import of one module in a fresh interpreter, desktop modules missing here are replaced
+IMPORT_PROBE = '''
+import time
+start = time.perf_counter()
+from desktop_placeholders import install_desktop_placeholders
+install_desktop_placeholders(load=False)
+import {module}
+print(f"IMPORT_MS {{(time.perf_counter() - start) * 1000:.3f}}")
+'''
+
+# Layouts of the shipped configuration files, so results compare across machines
+KURAST_REGION = (191, 15, 1391, 846)
+KURAST_TEMPLATE = 'images/target_20241029-223415.png'
+KURAST_CLICKS = ['click', 'right_click', 'click']  # Portal, tribute spot, portal button
+
+BARTER_TARGETS = ["B@®SS SUMM@NING", " SALVAGE"]
+ENCHANT_TARGETS = ["Attack Speed"]
+MASTERWORK_TARGET = "dexterity"
+
+
+def synthesize_kurast_fixture(count: int, rng: np.random.Generator, scale: float = 1.0) -> Fixture:
+    template = cv2.imread(KURAST_TEMPLATE)
+    if template is not None and scale != 1.0:
+        # The portal as it would look at another resolution or UI scale
+        template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    x, y, w, h = KURAST_REGION
+    frames = []
+    labels = []
+    for index in range(count):
+        noise = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, (w, h), interpolation=cv2.INTER_CUBIC)
+        found = template is not None and index % 2 == 0
+        if found:
+            tx = int(rng.integers(0, w - template.shape[1]))
+            ty = int(rng.integers(0, h - template.shape[0]))
+            frame[ty:ty + template.shape[0], tx:tx + template.shape[1]] = template
+        frames.append(frame)
+        labels.append(['portal' if found else ''])
+    return Fixture(frames, (x, y), [KURAST_REGION], labels)
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    func()  # Warm up caches and lazily created resources
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    # Memory is measured in a separate pass, tracemalloc slows everything down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(durations, peak)
+
+
+def print_stage(name: str, stats: dict) -> None:
+    print(f"{name:32s} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms"
+          f"   peak {stats['peak_kb']:9.1f} KB")
+
+
+def metadata(ocr_backend: str) -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ocr_backend': ocr_backend,
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def rotating(items: Sequence):
+    state = {'index': 0}
+
+    def next_item():
+        item = items[state['index'] % len(items)]
+        state['index'] += 1
+        return item
+    return next_item
+
+
+def prepare_cycle(tool, process, frame_source: ReplayFrameSource) -> Callable[[], None]:
+    process.settle = InstantSettle(process.stop_event)
+    process.timing.settle = process.settle
+    process.input = InputDevice(RecordingBackend())
+
+    def cycle():
+        process.run_cycle()
+        # A process stops itself once it reached its goal, keep it going for the next run
+        process.stop_event.clear()
+    return cycle
+
+
+def measure_stop_latency(process, repeat: int, rng: np.random.Generator) -> dict:
+    """Time from stopping a running worker at a random point of its loop until its thread exits."""
+    durations = []
+    for _ in range(repeat):
+        process.stop_event.clear()
+        worker = threading.Thread(target=process.run, daemon=True)
+        worker.start()
+        time.sleep(rng.uniform(0.0, 0.05))
+        start = time.perf_counter()
+        process.stop()  # What the kill switch hotkey does
+        worker.join()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def run_benchmarks(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    fixtures = text_fixtures(args.fixtures, args.frames, rng)
+    fixtures['kurast'] = load_recorded_fixture('kurast', args.fixtures) or synthesize_kurast_fixture(args.frames, rng)
+
+    responder = LabelResponder()
+    backend_name = configure_ocr(args.ocr, responder)
+    engine = get_ocr_engine()
+    barter = import_tool('barter')
+    enchant = import_tool('enchant')
+    masterwork = import_tool('masterwork')
+    kurast = import_tool('kurast')
+
+    for name in ('barter', 'enchant', 'masterwork'):
+        fixture = fixtures[name]
+        for frame, texts in zip(fixture.frames, fixture.labels):
+            source = ReplayFrameSource([frame], fixture.origin)
+            grabbed = source.grab(fixture.regions)
+            for region, text in zip(fixture.regions, texts):
+                image = grabbed.region(region)
+                responder.add(preprocess_image(image), text)
+                # What OCR sees with text line cropping enabled
+                responder.add(preprocess_image(TextRoiCache().crop(region, image)), text)
+
+    def frames_of(name):
+        fixture = fixtures[name]
+        return ReplayFrameSource(fixture.frames, fixture.origin)
+
+    barter_source = frames_of('barter')
+    regions = fixtures['barter'].regions
+    all_labels = [text for texts in fixtures['barter'].labels + fixtures['enchant'].labels for text in texts]
+    next_text = rotating(all_labels)
+    stages: Dict[str, Callable[[], object]] = {}
+
+    stages['preprocess_image'] = lambda: [preprocess_image(barter_source.grab(regions).region(region))
+                                          for region in regions]
+    pipeline = PreprocessPipeline()
+    region_keys = [tuple(region) for region in regions]
+
+    def pipeline_batch(target: PreprocessPipeline):
+        frame = barter_source.grab(regions)
+        return target.process_batch([frame.region(region) for region in regions], frame.channels, region_keys)
+    stages['preprocess.pipeline_batch'] = lambda: pipeline_batch(pipeline)
+    full_pipeline = PreprocessPipeline(PreprocessConfig(upscale=2.0, denoise=True, invert=True))
+    stages['preprocess.pipeline_upscale_denoise'] = lambda: pipeline_batch(full_pipeline)
+
+    def scan_uncached(func):
+        def run():
+            cache, engine.cache = engine.cache, None
+            try:
+                return func()
+            finally:
+                engine.cache = cache
+        return run
+
+    stages['scan_for_text'] = scan_uncached(
+        lambda: [scan_for_text(region, barter_source.grab(regions)) for region in regions])
+    stages['scan_for_text_batch'] = scan_uncached(
+        lambda: scan_for_text_batch(regions, barter_source.grab(regions)))
+    stages['scan_for_text_cached'] = lambda: [scan_for_text(region, barter_source.grab(regions))
+                                              for region in regions]
+
+    stages['text_roi.find_text_lines'] = lambda: [find_text_lines(barter_source.grab(regions).region(region))
+                                                  for region in regions]
+    text_roi = TextRoiCache()
+    stages['scan_for_text_roi'] = scan_uncached(
+        lambda: [scan_for_text(region, barter_source.grab(regions), roi=text_roi) for region in regions])
+    stages['scan_for_text_batch_roi'] = scan_uncached(
+        lambda: scan_for_text_batch(regions, barter_source.grab(regions), roi=text_roi))
+
+    matcher = compile_targets([word.strip() for word in BARTER_TARGETS])
+
+    def compiled_match():
+        text = next_text()
+        matcher.memo.clear()
+        return matcher.first_match(text)
+    stages['flexible_match'] = compiled_match
+    stages['flexible_match_reference'] = lambda: [reference_flexible_match(target.strip(), text)
+                                                  for text in [next_text()] for target in BARTER_TARGETS]
+
+    kurast_source = frames_of('kurast')
+    template_paths = [KURAST_TEMPLATE]
+    library = sorted(os.path.join('images', name) for name in os.listdir('images') if name.endswith('.png'))
+    stages['find_image_in_region'] = lambda: kurast.find_any_image_in_region(
+        template_paths, KURAST_REGION, 0.8, kurast_source)
+    stages['find_image_in_region_library'] = lambda: kurast.find_any_image_in_region(
+        library, KURAST_REGION, 0.8, kurast_source)
+    # After a match the process tries that capture first, and the rest of the library is skipped on a hit
+    recent_first = [KURAST_TEMPLATE] + [path for path in library if path != KURAST_TEMPLATE]
+    hit_source = ReplayFrameSource(kurast_source.frames[:1], kurast_source.origin)
+    stages['find_image_in_region_recent'] = lambda: kurast.find_any_image_in_region(
+        recent_first, KURAST_REGION, 0.8, hit_source)
+    # Once a portal was found, the next searches start in a window around it; the portal stays put here
+    tracker = kurast.PortalTracker()
+    still_source = ReplayFrameSource(kurast_source.frames[:1], kurast_source.origin)
+    full_match = kurast.find_tracked_image_in_region(template_paths, KURAST_REGION, 0.8, still_source,
+                                                     tracker=tracker)
+    stages['find_image_in_region_tracked'] = lambda: kurast.find_tracked_image_in_region(
+        template_paths, KURAST_REGION, 0.8, still_source, tracker=tracker)
+    tracked_match = stages['find_image_in_region_tracked']()
+    if full_match is None or tracked_match is None or tracked_match[0] != full_match[0]:
+        print(f"  find_image_in_region_tracked found {tracked_match}, the full search {full_match}")
+    # A portal drawn 15% larger than the capture, as at another resolution, and a frame without one
+    scales = scale_range(0.8, 1.25)
+    scaled_fixture = synthesize_kurast_fixture(2, np.random.default_rng(args.seed), 1.15)
+    scaled_source = ReplayFrameSource(scaled_fixture.frames[:1], scaled_fixture.origin)
+    empty_source = ReplayFrameSource(scaled_fixture.frames[1:], scaled_fixture.origin)
+    stages['find_image_in_region_scaled'] = lambda: kurast.find_any_image_in_region(
+        template_paths, KURAST_REGION, 0.8, scaled_source, scales=scales)
+    stages['find_image_in_region_scaled_miss'] = lambda: kurast.find_any_image_in_region(
+        template_paths, KURAST_REGION, 0.8, empty_source, scales=scales)
+    if stages['find_image_in_region_scaled']() is None:
+        print("  find_image_in_region_scaled missed the scaled portal")
+
+    barter_config = barter.RestockConfig((146, 765), list(regions), list(BARTER_TARGETS))
+    cycle_source = frames_of('barter')
+    processes = {'barter': barter.RestockProcess(barter_config, StatusRecorder(), cycle_source)}
+    stages['cycle.barter'] = scan_uncached(prepare_cycle(barter, processes['barter'], cycle_source))
+
+    enchant_fixture = fixtures['enchant']
+    enchant_config = enchant.EnchantConfig((700, 900), (800, 900), (900, 900), list(enchant_fixture.regions),
+                                           [(600, 320), (600, 380)], list(ENCHANT_TARGETS), click_delay=0.0)
+    cycle_source = frames_of('enchant')
+    processes['enchant'] = enchant.EnchantProcess(enchant_config, StatusRecorder(), cycle_source)
+    stages['cycle.enchant'] = scan_uncached(prepare_cycle(enchant, processes['enchant'], cycle_source))
+
+    masterwork_config = masterwork.Config((494, 904), (349, 819), (349, 819), (431, 353), (277, 950),
+                                          fixtures['masterwork'].regions[0], MASTERWORK_TARGET)
+    cycle_source = frames_of('masterwork')
+    processes['masterwork'] = masterwork.UpgradeProcess(masterwork_config, StatusRecorder(), cycle_source)
+    stages['cycle.masterwork'] = scan_uncached(prepare_cycle(masterwork, processes['masterwork'], cycle_source))
+
+    kurast.highlight_click = lambda *args, **kwargs: None
+    kurast_config = kurast.KurastConfig(KURAST_REGION, KURAST_TEMPLATE, (1353, 758), (384, 909),
+                                        click_delay=0.0, loop_delay=0.0, confidence=0.8)
+    cycle_source = frames_of('kurast')
+    processes['kurast'] = kurast.KurastProcess(kurast_config, StatusRecorder(), cycle_source)
+    stages['cycle.kurast'] = prepare_cycle(kurast, processes['kurast'], cycle_source)
+    # The same portal sequence with direct moves and no hover, input pacing only
+    direct_config = kurast.KurastConfig(KURAST_REGION, KURAST_TEMPLATE, (1353, 758), (384, 909),
+                                        click_delay=0.0, loop_delay=0.0, confidence=0.8,
+                                        move_duration=0.0, hover_delay=0.0)
+    cycle_source = frames_of('kurast')
+    direct_process = kurast.KurastProcess(direct_config, StatusRecorder(), cycle_source)
+    stages['cycle.kurast_direct'] = prepare_cycle(kurast, direct_process, cycle_source)
+
+    results = {}
+    for name, func in stages.items():
+        if args.stage and not any(name.startswith(prefix) for prefix in args.stage):
+            continue
+        repeat = args.cycle_repeat if name.startswith('cycle.') else args.repeat
+        results[name] = measure(func, repeat)
+        print_stage(name, results[name])
+
+    clicks = [action for action, *_ in processes['kurast'].input.backend.clicks()[:len(KURAST_CLICKS)]]
+    if 'cycle.kurast' in results and clicks != KURAST_CLICKS:
+        print(f"  cycle.kurast clicked {clicks}, expected {KURAST_CLICKS}")
+
+    for tool_name, process in processes.items():
+        name = f"stop.{tool_name}"
+        if args.stage and not any(name.startswith(prefix) for prefix in args.stage):
+            continue
+        results[name] = measure_stop_latency(process, args.repeat, rng)
+        print_stage(name, results[name])
+        if results[name]['p95_ms'] > STOP_TARGET_MS:
+            print(f"  {name} p95 is over the {STOP_TARGET_MS:.0f} ms kill switch target")
+
+    for name, target in (('preprocess.pipeline_batch', pipeline),
+                         ('preprocess.pipeline_upscale_denoise', full_pipeline)):
+        stats = target.stats()
+        if stats['calls']:
+            stage_times = ', '.join(f"{key[:-3]} {value / stats['calls'] * 1000:.1f} us"
+                                    for key, value in stats.items() if key.endswith('_ms'))
+            print(f"{name}: {stats['allocations']} buffer allocations over {stats['calls']} images; "
+                  f"per image {stage_times}")
+            results[name]['allocations'] = stats['allocations']
+            results[name]['calls'] = stats['calls']
+    roi_stats = text_roi.stats()
+    if roi_stats['misses']:
+        print(f"Text line cropping: OCR input area {roi_stats['area_ratio']:.0%} of the regions, "
+              f"{roi_stats['hits']} of {roi_stats['hits'] + roi_stats['misses']} crops from cache")
+    return {'meta': metadata(backend_name), 'stages': results, 'text_roi': roi_stats}
+
+
+def time_subprocess(command: List[str], marker: str, env: Optional[dict] = None) -> Optional[float]:
+    """Seconds reported by a fresh interpreter on its marker line, None if it failed."""
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=120,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    except subprocess.TimeoutExpired:
+        return None
+    for line in completed.stdout.splitlines():
+        if line.startswith(marker):
+            return float(line.split()[1]) / 1000
+    return None
+
+
+def run_startup(args) -> dict:
+    """Time to first launcher window and cold import time of every tool, in fresh interpreters."""
+    results = {}
+    probes = {f"import.{module}": [sys.executable, '-c', IMPORT_PROBE.format(module=module)]
+              for module in ('engine_service', 'barter', 'enchant', 'masterwork', 'kurast')}
+    probes['startup.launcher'] = [sys.executable, 'launcher.py']
+    env = dict(os.environ, D4_STARTUP_BENCHMARK='1')
+    for name, command in probes.items():
+        marker = 'STARTUP_MS' if name == 'startup.launcher' else 'IMPORT_MS'
+        # The first run writes the bytecode caches, like the first start after an update
+        time_subprocess(command, marker, env)
+        durations = [time_subprocess(command, marker, env) for _ in range(args.repeat)]
+        if any(duration is None for duration in durations):
+            print(f"{name:32s} skipped, it does not run on this machine")
+            continue
+        results[name] = summarize(durations)
+        print_stage(name, results[name])
+
+    launcher = results.get('startup.launcher')
+    if launcher is not None:
+        verdict = 'within' if launcher['p50_ms'] <= args.target else 'OVER'
+        print(f"Launcher first window p50 {launcher['p50_ms']:.0f} ms, {verdict} the {args.target:.0f} ms target")
+    return {'meta': metadata('none'), 'stages': results}
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    if baseline.get('meta', {}).get('ocr_backend') != results.get('meta', {}).get('ocr_backend'):
+        print("Note: baseline was recorded with a different OCR backend")
+    for name, stats in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p50_ms'] * (1 + threshold)
+        if stats['p50_ms'] > limit and stats['p50_ms'] - previous['p50_ms'] > NOISE_FLOOR_MS:
+            regressions.append(f"{name}: p50 {stats['p50_ms']:.3f} ms vs baseline {previous['p50_ms']:.3f} ms "
+                               f"(+{(stats['p50_ms'] / previous['p50_ms'] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def compare_exports(args) -> int:
+    """Stage by stage comparison of two stats exports or benchmark results."""
+    with open(args.before, 'r') as f:
+        before = json.load(f)
+    with open(args.after, 'r') as f:
+        after = json.load(f)
+    for name, stats in after['stages'].items():
+        previous = before['stages'].get(name)
+        if previous is None:
+            print(f"{name:32s} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms   (new)")
+            continue
+        print(f"{name:32s} p50 {previous['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms   "
+              f"p95 {previous['p95_ms']:9.3f} -> {stats['p95_ms']:9.3f} ms")
+    regressions = compare_to_baseline(after, before, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+def record_fixtures(args) -> None:
+    """Capture live frames of a tool's configured regions as replay fixtures."""
+    tool = import_tool(args.tool)
+    config = tool.load_config()
+    regions = list(getattr(config, 'scan_regions', None) or [config.scan_region])
+    out_dir = os.path.join(args.fixtures, args.tool)
+    os.makedirs(out_dir, exist_ok=True)
+    labels_file = os.path.join(out_dir, 'labels.json')
+    data = {'regions': regions, 'frames': {}}
+    if os.path.exists(labels_file):
+        with open(labels_file, 'r') as f:
+            data = json.load(f)
+    source = FrameSource()
+    for _ in range(args.count):
+        frame = source.grab(regions)
+        if frame is not None:
+            filename = f"frame_{time.strftime('%Y%m%d-%H%M%S')}_{len(data['frames']):03d}.png"
+            cv2.imwrite(os.path.join(out_dir, filename), frame.region_bgr(union_region(regions)))
+            # Labels start as what OCR reads today; correct them by hand where it is wrong
+            texts = [scan_for_text(region, frame) for region in regions] if args.tool != 'kurast' else ['']
+            data['frames'][filename] = texts
+            print(f"Saved {filename}: {texts}")
+        time.sleep(args.interval)
+    with open(labels_file, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay benchmarks for the D4 Assistant hot paths")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks (default)")
+    run_parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    run_parser.add_argument('--frames', type=int, default=6, help="Synthetic frames per tool")
+    run_parser.add_argument('--repeat', type=int, default=50)
+    run_parser.add_argument('--cycle-repeat', type=int, default=20)
+    run_parser.add_argument('--ocr', default='auto', choices=['auto', 'subprocess', 'tesserocr', 'fake'])
+    run_parser.add_argument('--stage', action='append', help="Only run stages starting with this prefix")
+    run_parser.add_argument('--seed', type=int, default=4)
+    run_parser.add_argument('--output', help="Write results to this JSON file")
+    run_parser.add_argument('--baseline', default=BASELINE_FILE)
+    run_parser.add_argument('--save-baseline', action='store_true')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    startup_parser = subparsers.add_parser('startup', help="Measure launcher and tool start-up time")
+    startup_parser.add_argument('--repeat', type=int, default=5)
+    startup_parser.add_argument('--target', type=float, default=STARTUP_TARGET_MS,
+                                help="Launcher time to first window, in milliseconds")
+    startup_parser.add_argument('--output', help="Write results to this JSON file")
+    startup_parser.add_argument('--baseline', default='startup_baseline.json')
+    startup_parser.add_argument('--save-baseline', action='store_true')
+    startup_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    record_parser = subparsers.add_parser('record', help="Capture fixture frames from the screen")
+    record_parser.add_argument('tool', choices=['barter', 'enchant', 'masterwork', 'kurast'])
+    record_parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    record_parser.add_argument('--count', type=int, default=5)
+    record_parser.add_argument('--interval', type=float, default=2.0)
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two stats exports or result files")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ('run', 'startup', 'record', 'compare', '-h', '--help'):
+        argv.insert(0, 'run')
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        record_fixtures(args)
+        return 0
+    if args.command == 'compare':
+        return compare_exports(args)
+
+    results = run_startup(args) if args.command == 'startup' else run_benchmarks(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    launcher = results['stages'].get('startup.launcher')
+    if args.command == 'startup' and launcher is not None and launcher['p50_ms'] > args.target:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,6 +29,24 @@ if os.path.exists('build'):
 # Create data list including Tesseract
 datas = [
     ('shared_config.py', '.'),
+    ('frame_source.py', '.'),
+    ('ocr_engine.py', '.'),
+    ('ocr_cache.py', '.'),
+    ('matcher.py', '.'),
+    ('scan_scheduler.py', '.'),
+    ('template_matching.py', '.'),
+    ('screen_settle.py', '.'),
+    ('engine_service.py', '.'),
+    ('lazy_loading.py', '.'),
+    ('text_roi.py', '.'),
+    ('preprocess.py', '.'),
+    ('text_scan.py', '.'),
+    ('status_channel.py', '.'),
+    ('kill_switch.py', '.'),
+    ('instrumentation.py', '.'),
+    ('logging_setup.py', '.'),
+    ('timing_controller.py', '.'),
+    ('input_backend.py', '.'),
     ('masterwork.py', '.'),
     ('kurast.py', '.'),
     ('barter.py', '.'),
@@ -0,0 +1,205 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import List, Optional, Sequence
+
+# replay goes first: it stands in for desktop modules this machine does not have
+from replay import (Fixture, InstantSettle, LabelResponder, ReplayFrameSource, configure_ocr, import_tool,
+                    load_recorded_fixture, summarize)
+from engine_service import EngineService
+from frame_source import FrameSource, union_region
+from input_backend import InputDevice, RecordingBackend, create_backend, get_input_device
+from instrumentation import format_stats
+from kill_switch import KILL_KEY, KillSwitch
+from ocr_engine import get_ocr_engine
+
+TOOLS = ['barter', 'enchant', 'masterwork', 'kurast']
+PROCESS_CLASSES = {
+    'barter': 'RestockProcess',
+    'enchant': 'EnchantProcess',
+    'masterwork': 'UpgradeProcess',
+    'kurast': 'KurastProcess',
+}
+
+
+class ConsoleStatus:
+    """Status sink of a headless run: counts messages and prints them when verbose."""
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.messages = 0
+
+    def post(self, message: object) -> None:
+        self.messages += 1
+        if self.verbose:
+            print(message)
+
+
+def load_tool_config(tool, path: Optional[str]):
+    if path:
+        # load_config reads the module's CONFIG_FILE when it is called
+        tool.CONFIG_FILE = path
+    return tool.load_config()
+
+
+def config_regions(config) -> List[tuple]:
+    return [tuple(region) for region in (getattr(config, 'scan_regions', None) or [config.scan_region])]
+
+
+def replay_source(name: str, frames_dir: str, config, origin: Optional[str]) -> tuple:
+    """Frames for a tool: recorded fixtures with labels, or a plain folder of screenshots."""
+    fixture = load_recorded_fixture(name, frames_dir)
+    if fixture is not None:
+        return ReplayFrameSource(fixture.frames, fixture.origin), fixture
+    if origin:
+        position = tuple(int(value) for value in origin.split(','))
+    else:
+        bbox = union_region(config_regions(config))
+        position = (bbox[0], bbox[1])
+    return ReplayFrameSource.from_directory(frames_dir, position), None
+
+
+def register_labels(responder: LabelResponder, fixture: Fixture, process) -> None:
+    """Let fake OCR answer with the labels, for the exact images this process will send."""
+    roi = getattr(process, 'text_roi', None)
+    pipeline = process.pipeline
+    for image, texts in zip(fixture.frames, fixture.labels):
+        frame = ReplayFrameSource([image], fixture.origin).grab(fixture.regions)
+        for region, text in zip(fixture.regions, texts):
+            crop = frame.region(region)
+            if roi is not None:
+                crop = roi.crop(region, crop)
+            responder.add(pipeline.process(crop, frame.channels, 'labels').copy(), text)
+    if roi is not None:
+        roi.clear()
+
+
+def run_tool(args) -> int:
+    tool = import_tool(args.tool)
+    config = load_tool_config(tool, args.config)
+    replaying = args.frames is not None
+    if replaying:
+        frame_source, fixture = replay_source(args.tool, args.frames, config, args.origin)
+        if not frame_source.frames:
+            print(f"No frames found in {args.frames}")
+            return 1
+    else:
+        frame_source, fixture = FrameSource(), None
+
+    responder = LabelResponder()
+    if replaying or args.ocr != 'auto':
+        backend_name = configure_ocr(args.ocr, responder)
+    else:
+        backend_name = get_ocr_engine().backend.name
+    input_sink = args.input or ('record' if replaying else 'screen')
+    if input_sink == 'record':
+        recorder = RecordingBackend()
+        device = InputDevice(recorder)
+        if hasattr(tool, 'highlight_click'):
+            tool.highlight_click = lambda *args, **kwargs: None
+    else:
+        device = InputDevice(create_backend('win32')) if input_sink == 'win32' else get_input_device()
+        try:
+            device.position()
+        except Exception as e:
+            print(f"Mouse input is not available here ({e}), use --input record")
+            return 1
+    engine = EngineService(frame_source=frame_source, input=device)
+    status = ConsoleStatus(args.verbose)
+    process = getattr(tool, PROCESS_CLASSES[args.tool])(config, status, frame_source, engine)
+
+    if (args.settle or ('instant' if replaying else 'screen')) == 'instant':
+        # Replayed frames never react to clicks, waiting for them would only add the timeouts
+        process.settle = InstantSettle(process.stop_event)
+        process.timing.settle = process.settle
+    if fixture is not None and hasattr(process, 'pipeline'):
+        register_labels(responder, fixture, process)
+
+    print(f"{args.tool}: {args.cycles} cycles, {len(frame_source.frames) if replaying else 'live'} frames, "
+          f"OCR {backend_name}, input {input_sink}")
+    kill_switch = None
+    if not replaying:
+        # The game has the focus in a live run, so Ctrl+C cannot reach this console
+        kill_switch = KillSwitch(notify=lambda: print("Kill switch pressed, stopping"))
+        kill_switch.start()
+        kill_switch.arm(process.stop_event)
+        print(f"Press {KILL_KEY.upper()} to stop")
+    max_count = getattr(config, 'max_count', None)
+    durations = []
+    errors = 0
+    goals = 0
+    start = time.perf_counter()
+    try:
+        for _ in range(args.cycles):
+            cycle_start = time.perf_counter()
+            try:
+                with process.metrics.span('cycle'):
+                    process.run_cycle()
+                process.metrics.count('cycles')
+            except Exception as e:
+                errors += 1
+                logging.error(f"Error in {args.tool} cycle: {e}")
+            durations.append(time.perf_counter() - cycle_start)
+            if not replaying:
+                # Live, a goal or the kill switch ends the run like the tool's own loop does
+                if max_count is not None and getattr(process, 'count', 0) >= max_count:
+                    goals += 1
+                    break
+                if process.stop_event.is_set():
+                    if not kill_switch.pressed_at:
+                        goals += 1
+                    break
+            elif process.stop_event.is_set():
+                # The tool reached its goal and stopped itself; keep cycling for throughput
+                goals += 1
+                process.stop_event.clear()
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        if kill_switch is not None:
+            kill_switch.close()
+    elapsed = time.perf_counter() - start
+
+    if durations:
+        stats = summarize(durations)
+        print(f"{len(durations)} cycles in {elapsed:.2f} s, {len(durations) / elapsed:.1f} cycles/s, "
+              f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms")
+    print(f"{goals} goals reached, {errors} errors, {status.messages} status messages"
+          + (f", {len(recorder.clicks())} clicks" if input_sink == 'record' else ''))
+    print(format_stats(process.metrics.snapshot()))
+    if args.export:
+        print(f"Stats written to {process.metrics.export(args.export)}")
+    return 1 if errors else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='d4assistant', description="Run the D4 Assistant tools without a GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run a tool's worker loop")
+    run_parser.add_argument('tool', choices=TOOLS)
+    run_parser.add_argument('--config', help="Tool config file, the tool's own by default")
+    run_parser.add_argument('--frames', help="Fixtures directory from `benchmark.py record`, or a folder of "
+                                             "screenshots; the live screen when omitted")
+    run_parser.add_argument('--origin', help="Screen position x,y of plain screenshots, "
+                                             "the top left of the scan regions by default")
+    run_parser.add_argument('--cycles', type=int, default=100)
+    run_parser.add_argument('--ocr', default='auto', choices=['auto', 'subprocess', 'tesserocr', 'fake'])
+    run_parser.add_argument('--input', choices=['record', 'screen', 'win32'],
+                            help="Record mouse actions or send them (win32: through pywin32, without "
+                                 "the corner fail-safe); record when replaying frames")
+    run_parser.add_argument('--settle', choices=['instant', 'screen'],
+                            help="Skip or watch for UI updates after clicks; instant when replaying frames")
+    run_parser.add_argument('--verbose', action='store_true', help="Print every status message")
+    run_parser.add_argument('--export', help="Write the stage statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.frames is not None and not os.path.isdir(args.frames):
+        parser.error(f"{args.frames} is not a directory")
+    return run_tool(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+# Imported by the tool modules but only needed to drive the real screen and GUI
+DESKTOP_MODULES = ['PySimpleGUI', 'pyautogui', 'keyboard', 'win32gui', 'win32api', 'win32con']
+
+
+class UnavailableModule(types.ModuleType):
+    """Placeholder for a desktop-only module that cannot be loaded on this machine."""
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return UnavailableModule(f"{self.__name__}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        raise RuntimeError(f"{self.__name__} is not available when replaying recorded frames")
+
+
+def install_desktop_placeholders(load: bool = True) -> None:
+    """Put a placeholder in place of every desktop module that cannot be used here.
+
+    With load=False only missing modules are replaced, the others are not
+    imported; enough for importing the tools, which load them lazily.
+    """
+    for module_name in DESKTOP_MODULES:
+        if module_name in sys.modules:
+            continue
+        try:
+            if load:
+                importlib.import_module(module_name)
+            elif importlib.util.find_spec(module_name) is None:
+                raise ImportError(module_name)
+        except Exception:
+            sys.modules[module_name] = UnavailableModule(module_name)
@@ -1,8 +1,4 @@
 import PySimpleGUI as sg
-import pyautogui
-import pytesseract
-import cv2
-import numpy as np
 import json
 import os
 import threading
@@ -10,22 +6,27 @@ import time
 import win32gui
 import win32api
 import win32con
-import keyboard
 import logging
 import tkinter as tk
-from PIL import ImageGrab, ImageTk
-from typing import Dict, List, Tuple, Optional
+from typing import List, Tuple, Optional
 from dataclasses import dataclass, asdict
-import re 
 from threading import Lock
 from shared_config import apply_theme
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+from frame_source import FrameSource, union_region
+from engine_service import EngineService, get_engine_service
+from screen_settle import SettleDetector, region_signature
+from timing_controller import TimingController
+from text_roi import TextRoiCache
+from preprocess import PreprocessConfig, PreprocessPipeline
+from text_scan import scan_for_result
+from ocr_engine import OcrResult
+from status_channel import STATUS_EVENT, OutputConsole, StatusChannel
+from instrumentation import Metrics, format_stats
+from logging_setup import setup_logging
+from kill_switch import KILL_EVENT, KillSwitch
 
 CONFIG_FILE = 'enchant_config.json'
 
-logging.basicConfig(filename='enchant_assistant.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 @dataclass
 class EnchantConfig:
@@ -39,6 +40,13 @@ class EnchantConfig:
     enchant_delay: float = 1.0      # Delay after clicking enchant
     replace_delay: float = 0.5      # Delay between scan and replace
     loop_delay: float = 1.0         # Delay between iterations
+    wait_for_settle: bool = True    # Treat the delays above as timeouts and continue once the screen settles
+    adaptive_timing: bool = True    # Shrink those timeouts toward the measured screen latency
+    crop_text_lines: bool = False   # OCR only the text lines found inside each region
+    preprocess: dict = None         # PreprocessConfig fields: upscale, denoise, invert
+    ocr_config: str = ''            # Tesseract options, e.g. '--psm 7'; written by ocr_tuner.py
+    min_confidence: float = 0.0     # Words OCR'd below this confidence (0-100) are ignored when matching
+    rescan_confidence: float = 0.0  # Regions with a word below this are read again with other preprocessing, 0 never
 
     def __post_init__(self):
         if self.target_words is None:
@@ -63,7 +71,9 @@ def load_config() -> EnchantConfig:
             
             valid_keys = {'enchant_button', 'replace_button', 'close_button', 
                          'scan_regions', 'scan_buttons', 'target_words', 
-                         'click_delay', 'enchant_delay', 'replace_delay', 'loop_delay'}
+                         'click_delay', 'enchant_delay', 'replace_delay', 'loop_delay',
+                         'wait_for_settle', 'adaptive_timing', 'crop_text_lines', 'preprocess', 'ocr_config',
+                         'min_confidence', 'rescan_confidence'}
             default_config_dict = {k: v for k, v in default_config_dict.items() 
                                  if k in valid_keys}
             
@@ -73,91 +83,105 @@ def load_config() -> EnchantConfig:
     return default_config
 
 class EnchantProcess(threading.Thread):
-    def __init__(self, config: EnchantConfig, window: sg.Window):
+    def __init__(self, config: EnchantConfig, status: StatusChannel,
+                 frame_source: Optional[FrameSource] = None, engine: Optional[EngineService] = None):
         super().__init__()
         self.config = config
-        self.window = window
+        self.status = status
+        self.engine = engine or get_engine_service()
+        self.frame_source = frame_source or self.engine.frame_source
+        self.input = self.engine.input
+        self.matcher = self.engine.matcher([word.strip() for word in config.target_words])
+        self.metrics = self.engine.instrument(Metrics('enchant'))
         self.stop_event = threading.Event()
+        self.settle = SettleDetector(self.frame_source, config.wait_for_settle,
+                                     stop_event=self.stop_event)
+        self.timing = TimingController('enchant', self.settle, config.adaptive_timing, self.metrics)
+        self.watch_region = union_region(config.scan_regions)
+        self.text_roi = TextRoiCache() if config.crop_text_lines else None
+        self.pipeline = PreprocessPipeline(PreprocessConfig.from_dict(config.preprocess))
+        self.rescan_pipeline = PreprocessPipeline(self.pipeline.config.variant()) \
+            if config.rescan_confidence > 0 else None
+        self.read_words = config.min_confidence > 0 or self.rescan_pipeline is not None
         self.keyboard_lock = Lock()
 
     def run(self) -> None:
         while not self.stop_event.is_set():
             try:
-                # Click enchant button
-                click_button(*self.config.enchant_button, self.config.click_delay)
-                self.window.write_event_value('-UPDATE-', "Clicked Enchant button")
-                time.sleep(self.config.enchant_delay)
-
-                found_target = False
-                # Check each region for any of the target words
-                for region_index, region in enumerate(self.config.scan_regions):
-                    scanned_text = scan_for_text(region)
-                    self.window.write_event_value('-UPDATE-', 
-                        f"Scanning region {region_index + 1}: {scanned_text}")
-                    
-                    # Check each target word
-                    for target_word in self.config.target_words:
-                        if self.flexible_match(target_word.strip(), scanned_text):
-                            # Click the corresponding scan button for this region
-                            click_button(*self.config.scan_buttons[region_index], self.config.click_delay)
-                            self.window.write_event_value('-UPDATE-', 
-                                f"Found '{target_word}' in region {region_index + 1} and clicked its button")
-                            
-                            # Click replace button
-                            time.sleep(self.config.replace_delay)
-                            click_button(*self.config.replace_button, self.config.click_delay)
-                            self.window.write_event_value('-UPDATE-', "Clicked Replace button")
-                            found_target = True
-                            
-                            # Stop the process after replacing
-                            self.stop()
-                            self.window.write_event_value('-UPDATE-', 
-                                "Target found and replaced. Process stopped.")
-                            return
-                    
-                    if found_target:
-                        break
-                
-                if not found_target:
-                    # If target not found, click close
-                    click_button(*self.config.close_button)
-                    self.window.write_event_value('-UPDATE-', "Target not found, clicked Close button")
-                
-                time.sleep(self.config.loop_delay)
+                with self.metrics.span('cycle'):
+                    self.run_cycle()
+                self.metrics.count('cycles')
             except Exception as e:
                 logging.error(f"Error in enchant process: {e}")
-                self.window.write_event_value('-UPDATE-', f"Error occurred: {e}")
-                time.sleep(5)
-
-    def flexible_match(self, target: str, text: str) -> bool:
-        target = target.lower()
-        text = text.lower()
-        
-        def normalize_spaces(s: str) -> str:
-            return re.sub(r'\s+', ' ', s).strip()
-        
-        target = normalize_spaces(target)
-        text = normalize_spaces(text)
-        
-        target_words = target.split()
-        text_words = text.split()
-        matched_words = set()
+                self.status.post(f"Error occurred: {e}")
+                self.stop_event.wait(5)
+        self.timing.save()
+
+    def run_cycle(self) -> None:
+        # Click enchant button
+        reference = self.settle.sample(self.watch_region)
+        with self.metrics.span('click'):
+            self.input.click(*self.config.enchant_button, stop_event=self.stop_event)
+        self.status.post("Clicked Enchant button")
+        with self.metrics.span('wait'):
+            self.timing.wait('enchant', self.watch_region,
+                             self.config.click_delay + self.config.enchant_delay, reference)
+
+        found_target = False
+        with self.metrics.span('capture'):
+            frame = self.frame_source.grab(self.config.scan_regions)
+        # Regions are OCR'd concurrently; results stop at the first region with a match
+        min_confidence = self.config.min_confidence
+        results, _ = self.engine.scheduler.first_hit(
+            self.config.scan_regions,
+            lambda region: scan_for_result(region, frame, self.engine.ocr, self.text_roi, self.pipeline,
+                                           self.config.ocr_config, self.metrics, self.config.rescan_confidence,
+                                           self.rescan_pipeline, self.read_words) if frame is not None else OcrResult(""),
+            lambda result: self.matcher.first_match(result.trusted_text(min_confidence)) is not None,
+            self.stop_event)
+        if self.stop_event.is_set():
+            return  # Stopped while the regions were being read, click nothing
+        scanned_texts = [result.trusted_text(min_confidence) for result in results]
+        # Check each region for any of the target words
+        for region_index, scanned_text in enumerate(scanned_texts):
+            self.status.post(f"Scanning region {region_index + 1}: {scanned_text}")
+            
+            # All target words are checked in one pass over the text
+            with self.metrics.span('match'):
+                target_word = self.matcher.first_match(scanned_text)
+            if target_word is not None:
+                # Click the corresponding scan button for this region
+                reference = region_signature(frame.image) if frame is not None else None
+                with self.metrics.span('click'):
+                    self.input.click(*self.config.scan_buttons[region_index], stop_event=self.stop_event)
+                self.status.post(f"Found '{target_word}' in region {region_index + 1} and clicked its button")
+                
+                # Click replace button
+                with self.metrics.span('wait'):
+                    self.timing.wait('select', self.watch_region,
+                                     self.config.click_delay + self.config.replace_delay, reference)
+                with self.metrics.span('click'):
+                    self.input.click(*self.config.replace_button, delay=self.config.click_delay,
+                                     stop_event=self.stop_event)
+                self.status.post("Clicked Replace button")
+                found_target = True
+                
+                # Stop the process after replacing
+                self.stop()
+                self.status.post("Target found and replaced. Process stopped.")
+                return
         
-        for target_word in target_words:
-            if any(self.partial_word_match(target_word, text_word) for text_word in text_words):
-                matched_words.add(target_word)
+        if not found_target:
+            # If target not found, click close
+            with self.metrics.span('click'):
+                self.input.click(*self.config.close_button, stop_event=self.stop_event)
+            self.status.post("Target not found, clicked Close button")
         
-        return len(matched_words) == len(target_words)
+        reference = region_signature(frame.image) if frame is not None else None
+        with self.metrics.span('wait'):
+            # The click's own short delay is part of the learned wait
+            self.timing.wait('close', self.watch_region, 0.1 + self.config.loop_delay, reference)
 
-    def partial_word_match(self, word: str, text: str) -> bool:
-        if word in text:
-            return True
-        
-        min_match_length = max(3, len(word) // 2)
-        for i in range(len(text) - min_match_length + 1):
-            if text[i:i+min_match_length] in word:
-                return True
-        return False
 
     def stop(self) -> None:
         with self.keyboard_lock:
@@ -211,8 +235,9 @@ def create_main_window(config: EnchantConfig) -> sg.Window:
 
     layout.extend([
         [sg.Button("Save Configuration"), sg.Button("Start Process"), 
-         sg.Button("Stop Process"), sg.Button("Exit")],
-        [sg.Multiline(size=(60, 10), key='OUTPUT', disabled=True)]
+         sg.Button("Stop Process"), sg.Button("Export Stats"), sg.Button("Exit")],
+        [sg.Multiline(size=(60, 10), key='OUTPUT', disabled=True)],
+        [sg.Text("", key='STATS', font=('Courier', 9), size=(60, 11))]
     ])
     
     return sg.Window("Enchant Helper", 
@@ -235,30 +260,6 @@ def validate_config(config: EnchantConfig) -> bool:
         return False
     return True
 
-def capture_screen_region(region: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
-    try:
-        screenshot = pyautogui.screenshot(region=region)
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    except Exception as e:
-        logging.error(f"Error capturing screen region: {e}")
-        return None
-
-def preprocess_image(image: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-
-def scan_for_text(region: Tuple[int, int, int, int]) -> str:
-    image = capture_screen_region(region)
-    if image is None:
-        return ""
-    processed_image = preprocess_image(image)
-    try:
-        text = pytesseract.image_to_string(processed_image)
-        return text.strip()
-    except Exception as e:
-        logging.error(f"Error scanning for text: {e}")
-        return ""
-
 def get_mouse_click() -> Tuple[int, int]:
     while True:
         if win32api.GetAsyncKeyState(0x01) & 0x8000:  # Left mouse button
@@ -343,22 +344,20 @@ def save_config(config: EnchantConfig) -> None:
     except Exception as e:
         logging.error(f"Error saving configuration: {e}")
 
-def click_button(x: int, y: int, delay: float = 0.1) -> None:
-    try:
-        pyautogui.click(x, y)
-        time.sleep(delay)
-    except Exception as e:
-        logging.error(f"Error clicking button at ({x}, {y}): {e}")
-
-def main():
+def main(engine: Optional[EngineService] = None):
+    setup_logging('enchant')
     apply_theme()
     config = load_config()
     window = create_main_window(config)
+    console = OutputConsole(window['OUTPUT'])
+    status = StatusChannel(window)
     enchant_process = None
-    keyboard_lock = Lock()
+    kill_switch = KillSwitch(window)
+    metrics = None  # Stats of the latest run, kept after it stops
+    kill_switch.start()
 
     while True:
-        event, values = window.read(timeout=100)
+        event, values = window.read()
         if event == sg.WINDOW_CLOSED or event == "Exit":
             break
         elif event.startswith('GET_'):
@@ -392,50 +391,58 @@ def main():
                     click_delay=float(values['CLICK_DELAY']),
                     enchant_delay=float(values['ENCHANT_DELAY']),
                     replace_delay=float(values['REPLACE_DELAY']),
-                    loop_delay=float(values['LOOP_DELAY'])
+                    loop_delay=float(values['LOOP_DELAY']),
+                    wait_for_settle=config.wait_for_settle,
+                    adaptive_timing=config.adaptive_timing,
+                    crop_text_lines=config.crop_text_lines,
+                    preprocess=config.preprocess,
+                    ocr_config=config.ocr_config,
+                    min_confidence=config.min_confidence,
+                    rescan_confidence=config.rescan_confidence
                 )
                 if validate_config(new_config):
                     save_config(new_config)
                     config = new_config
-                    window['OUTPUT'].print("Configuration saved successfully.")
+                    console.print("Configuration saved successfully.")
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
             except ValueError:
-                window['OUTPUT'].print("Invalid input. Please check all fields.")
+                console.print("Invalid input. Please check all fields.")
         elif event == "Start Process":
             if enchant_process is None or not enchant_process.is_alive():
                 if validate_config(config):
-                    enchant_process = EnchantProcess(config, window)
+                    enchant_process = EnchantProcess(config, status, engine=engine)
+                    kill_switch.arm(enchant_process.stop_event)
+                    metrics = enchant_process.metrics
                     enchant_process.start()
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
         elif event == "Stop Process":
             if enchant_process and enchant_process.is_alive():
                 enchant_process.stop()
                 enchant_process.join()
-                window['OUTPUT'].print("Process stopped.")
-        elif event == '-UPDATE-':
-            window['OUTPUT'].print(values['-UPDATE-'])
-        
-        try:
-            with keyboard_lock:
-                if keyboard.is_pressed('p'):
-                    if enchant_process and enchant_process.is_alive():
-                        enchant_process.stop()
-                        enchant_process.join(timeout=1.0)
-                        if enchant_process.is_alive():
-                            enchant_process.join()
-                        window['OUTPUT'].print("Process terminated by user (P key pressed)")
-                        enchant_process = None
-                    time.sleep(0.1)
-        except Exception as e:
-            logging.error(f"Error in keyboard handling: {e}")
-            window['OUTPUT'].print(f"Error in keyboard handling: {e}")
+                console.print("Process stopped.")
+        elif event == STATUS_EVENT:
+            console.write(status.drain())
+            if metrics is not None:
+                window['STATS'].update(format_stats(metrics.snapshot()))
+        elif event == "Export Stats":
+            path = metrics.export() if metrics is not None else None
+            console.print(f"Stats exported to {path}" if path else "No stats to export yet.")
+        elif event == KILL_EVENT:
+            # The hotkey hook already stopped the process, only wait for it to finish
+            if enchant_process:
+                enchant_process.join()
+                stopped_ms = (time.perf_counter() - kill_switch.pressed_at) * 1000
+                console.print(f"Process terminated by user (P key pressed), stopped in {stopped_ms:.0f} ms")
+                enchant_process = None
 
     if enchant_process and enchant_process.is_alive():
         enchant_process.stop()
         enchant_process.join(timeout=1.0)
 
+    kill_switch.close()
+    status.close()
     window.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import glob
+import logging
+import threading
+from typing import Optional, Sequence
+
+from frame_source import FrameSource, get_frame_source
+from ocr_engine import OcrEngine, get_ocr_engine
+from template_matching import TemplateCache, get_template_cache
+from scan_scheduler import ScanScheduler, get_scan_scheduler
+from matcher import TargetMatcher, compile_targets
+from instrumentation import Metrics
+from input_backend import InputDevice, get_input_device
+
+TEMPLATE_GLOB = 'images/*.png'
+
+
+class EngineService:
+    """Capture, OCR, image matching and input resources shared by every tool in the process.
+
+    The launcher owns one service for its whole lifetime and hands it to each
+    tool it opens, so switching tools reuses the running OCR backend, decoded
+    templates and worker threads. A tool started on its own gets the same
+    service through get_engine_service().
+    """
+
+    def __init__(self, frame_source: Optional[FrameSource] = None, ocr: Optional[OcrEngine] = None,
+                 templates: Optional[TemplateCache] = None, scheduler: Optional[ScanScheduler] = None,
+                 input: Optional[InputDevice] = None):
+        self.frame_source = frame_source or get_frame_source()
+        self.ocr = ocr or get_ocr_engine()
+        self.templates = templates or get_template_cache()
+        self.scheduler = scheduler or get_scan_scheduler()
+        self.input = input or get_input_device()
+        self.warm_up_thread: Optional[threading.Thread] = None
+
+    def matcher(self, targets: Sequence[str]) -> TargetMatcher:
+        # Compiled matchers are cached, tools asking for the same targets share one
+        return compile_targets(targets)
+
+    def instrument(self, metrics: Metrics) -> Metrics:
+        """Count the OCR work done through this service in metrics."""
+        metrics.watch('ocr_calls', lambda: self.ocr.backend_calls)
+        metrics.watch('ocr_cache_hits', lambda: self.ocr.cache.hits if self.ocr.cache is not None else 0)
+        return metrics
+
+    def warm_up(self, template_paths: Optional[Sequence[str]] = None) -> None:
+        """Start the OCR backend and decode the portal templates ahead of first use."""
+        try:
+            self.ocr.backend
+        except Exception as e:
+            logging.error(f"Error starting OCR backend: {e}")
+        for path in template_paths if template_paths is not None else sorted(glob.glob(TEMPLATE_GLOB)):
+            self.templates.get(path)
+
+    def start_warm_up(self, template_paths: Optional[Sequence[str]] = None) -> threading.Thread:
+        if self.warm_up_thread is None:
+            self.warm_up_thread = threading.Thread(target=self.warm_up, args=(template_paths,),
+                                                   name='engine-warm-up', daemon=True)
+            self.warm_up_thread.start()
+        return self.warm_up_thread
+
+    def close(self) -> None:
+        self.scheduler.shutdown()
+        if self.ocr.cache is not None:
+            self.ocr.cache.save()
+
+
+_default_service = EngineService()
+
+
+def get_engine_service() -> EngineService:
+    return _default_service
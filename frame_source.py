@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+import logging
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+from dataclasses import dataclass
+
+from lazy_loading import lazy_import
+
+pyautogui = lazy_import('pyautogui')
+
+Region = Tuple[int, int, int, int]
+
+
+def union_region(regions: Sequence[Region]) -> Region:
+    """Smallest (x, y, width, height) box containing every region."""
+    left = min(region[0] for region in regions)
+    top = min(region[1] for region in regions)
+    right = max(region[0] + region[2] for region in regions)
+    bottom = max(region[1] + region[3] for region in regions)
+    return (left, top, right - left, bottom - top)
+
+
+def intersect_region(a: Region, b: Region) -> Optional[Region]:
+    """Overlap of two (x, y, width, height) boxes, None when they do not overlap."""
+    left, top = max(a[0], b[0]), max(a[1], b[1])
+    right, bottom = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if right <= left or bottom <= top:
+        return None
+    return (left, top, right - left, bottom - top)
+
+
+@dataclass
+class Frame:
+    image: np.ndarray  # Pixels of the grabbed bounding box, in channels order
+    origin: Tuple[int, int]  # Screen position of image[0, 0]
+    timestamp: float
+    channels: str = 'BGR'  # Screen grabs stay RGB, consumers convert only what they use
+
+    def region(self, region: Region) -> Optional[np.ndarray]:
+        # Returns a view into the frame, no pixels are copied
+        x = region[0] - self.origin[0]
+        y = region[1] - self.origin[1]
+        height, width = self.image.shape[:2]
+        if x < 0 or y < 0 or x + region[2] > width or y + region[3] > height:
+            logging.error(f"Region {region} is outside the grabbed frame")
+            return None
+        return self.image[y:y + region[3], x:x + region[2]]
+
+    def region_bgr(self, region: Region) -> Optional[np.ndarray]:
+        image = self.region(region)
+        if image is None or self.channels == 'BGR':
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+
+class FrameSource:
+    """Grabs the union of all regions of a cycle in a single screenshot."""
+
+    def __init__(self):
+        # Scan workers, settle waits and the tools share one source; grabs go one at a time
+        self.lock = threading.Lock()
+
+    def grab(self, regions: Sequence[Region]) -> Optional[Frame]:
+        if not regions:
+            return None
+        bbox = union_region(regions)
+        try:
+            with self.lock:
+                screenshot = pyautogui.screenshot(region=bbox)
+            return Frame(np.asarray(screenshot), (bbox[0], bbox[1]), time.perf_counter(), 'RGB')
+        except Exception as e:
+            logging.error(f"Error capturing screen region: {e}")
+            return None
+
+
+_default_source = FrameSource()
+
+
+def get_frame_source() -> FrameSource:
+    return _default_source
+
+
+def capture_screen_region(region: Region,
+                          frame_source: Optional[FrameSource] = None) -> Optional[np.ndarray]:
+    """BGR pixels of one region."""
+    frame = (frame_source or _default_source).grab([region])
+    if frame is None:
+        return None
+    return frame.region_bgr(region)
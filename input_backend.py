@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from kill_switch import pause
+from lazy_loading import lazy_import
+
+pyautogui = lazy_import('pyautogui')
+win32api = lazy_import('win32api')
+win32con = lazy_import('win32con')
+
+MOVE_STEPS = 20  # Positions per glide; a set stop event interrupts between steps
+
+
+class InputBackend:
+    """Sends mouse input without waiting; every pause is up to the caller."""
+    name = 'base'
+
+    def position(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def move(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = 'left') -> None:
+        """Click at (x, y), or where the cursor is when they are None."""
+        raise NotImplementedError
+
+
+class PyAutoGuiBackend(InputBackend):
+    """pyautogui with its global PAUSE switched off, so it adds no sleep after each call.
+
+    Its fail-safe stays on: moving the mouse into a screen corner raises and stops the tool.
+    """
+    name = 'pyautogui'
+
+    def __init__(self):
+        pyautogui.PAUSE = 0
+
+    def position(self) -> Tuple[int, int]:
+        return tuple(pyautogui.position())
+
+    def move(self, x: int, y: int) -> None:
+        pyautogui.moveTo(x, y)
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = 'left') -> None:
+        pyautogui.click(x, y, button=button)
+
+
+class Win32Backend(InputBackend):
+    """SetCursorPos and mouse_event straight from pywin32, without pyautogui's checks or corner fail-safe."""
+    name = 'win32'
+
+    def __init__(self):
+        self.buttons = {
+            'left': (win32con.MOUSEEVENTF_LEFTDOWN, win32con.MOUSEEVENTF_LEFTUP),
+            'right': (win32con.MOUSEEVENTF_RIGHTDOWN, win32con.MOUSEEVENTF_RIGHTUP),
+            'middle': (win32con.MOUSEEVENTF_MIDDLEDOWN, win32con.MOUSEEVENTF_MIDDLEUP),
+        }
+
+    def position(self) -> Tuple[int, int]:
+        return tuple(win32api.GetCursorPos())
+
+    def move(self, x: int, y: int) -> None:
+        win32api.SetCursorPos((int(x), int(y)))
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = 'left') -> None:
+        if x is not None and y is not None:
+            self.move(x, y)
+        down, up = self.buttons[button]
+        win32api.mouse_event(down, 0, 0, 0, 0)
+        win32api.mouse_event(up, 0, 0, 0, 0)
+
+
+class RecordingBackend(InputBackend):
+    """Records mouse actions and when they happened instead of performing them."""
+    name = 'recording'
+
+    def __init__(self):
+        self.actions: List[Tuple[str, int, int, float]] = []
+        self.x = self.y = 0
+
+    def _record(self, action: str, x: Optional[int], y: Optional[int]) -> None:
+        if x is not None and y is not None:
+            self.x, self.y = x, y
+        self.actions.append((action, self.x, self.y, time.perf_counter()))
+
+    def position(self) -> Tuple[int, int]:
+        return self.x, self.y
+
+    def move(self, x: int, y: int) -> None:
+        self._record('move', x, y)
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = 'left') -> None:
+        self._record('right_click' if button == 'right' else 'click', x, y)
+
+    def clicks(self) -> List[Tuple[str, int, int, float]]:
+        return [action for action in self.actions if action[0] != 'move']
+
+
+def create_backend(name: str = 'auto') -> InputBackend:
+    if name == 'recording':
+        return RecordingBackend()
+    if name == 'win32':
+        # Opt-in only: 'auto' keeps pyautogui's corner fail-safe
+        try:
+            return Win32Backend()
+        except Exception as e:
+            logging.error(f"Direct Win32 input unavailable, falling back to pyautogui: {e}")
+    return PyAutoGuiBackend()
+
+
+class InputDevice:
+    """Mouse input with explicit pacing: nothing waits unless the caller passes a delay or duration."""
+
+    def __init__(self, backend: Optional[InputBackend] = None):
+        self._backend = backend
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self) -> InputBackend:
+        if self._backend is None:
+            with self.lock:
+                if self._backend is None:
+                    self._backend = create_backend()
+        return self._backend
+
+    def set_backend(self, backend: InputBackend) -> None:
+        with self.lock:
+            self._backend = backend
+
+    def position(self) -> Tuple[int, int]:
+        return self.backend.position()
+
+    def move_to(self, x: int, y: int, duration: float = 0.0,
+                stop_event: Optional[threading.Event] = None) -> bool:
+        """Jump to (x, y), or glide there over duration; returns False if stopped on the way."""
+        if stop_event is not None and stop_event.is_set():
+            return False
+        try:
+            if duration <= 0:
+                self.backend.move(x, y)
+                return True
+            start_x, start_y = self.backend.position()
+            for step in range(1, MOVE_STEPS + 1):
+                self.backend.move(round(start_x + (x - start_x) * step / MOVE_STEPS),
+                                  round(start_y + (y - start_y) * step / MOVE_STEPS))
+                if not pause(duration / MOVE_STEPS, stop_event):
+                    return False
+            return True
+        except Exception as e:
+            logging.error(f"Error moving mouse to ({x}, {y}): {e}")
+            return False
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = 'left',
+              delay: float = 0.0, stop_event: Optional[threading.Event] = None) -> bool:
+        """Click, then pause for delay. A stopped process never clicks; returns False if it was stopped."""
+        if stop_event is not None and stop_event.is_set():
+            return False
+        try:
+            self.backend.click(x, y, button)
+        except Exception as e:
+            logging.error(f"Error clicking at ({x}, {y}): {e}")
+            return False
+        return pause(delay, stop_event) if delay > 0 else True
+
+
+_default_device = InputDevice()
+
+
+def get_input_device() -> InputDevice:
+    return _default_device
@@ -0,0 +1,146 @@
+import contextlib
+import json
+import logging
+import math
+import threading
+import time
+from typing import Callable, ContextManager, Dict, Optional, Tuple
+
+SUB_BUCKETS = 16  # Buckets per doubling, percentiles are within ~4% of the true value
+MIN_SECONDS = 1e-6  # Everything faster lands in the first bucket
+STAGES = ['capture', 'preprocess', 'ocr', 'match', 'move', 'click', 'wait', 'cycle']  # Panel order
+
+
+class Histogram:
+    """Latency histogram with log-spaced buckets, in the spirit of HdrHistogram.
+
+    Recording is constant time and memory only grows with the range of
+    values seen, so a tool can record every stage of every cycle for hours.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = int(math.log2(max(seconds, MIN_SECONDS) / MIN_SECONDS) * SUB_BUCKETS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Upper edge of the bucket, never above the largest value recorded
+                return min(MIN_SECONDS * 2 ** ((index + 1) / SUB_BUCKETS), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'runs': self.count,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000,
+        }
+
+
+class Metrics:
+    """Stage timings and counters of one worker, safe to record from any thread."""
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.watched: Dict[str, Tuple[Callable[[], int], int]] = {}
+        self.started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def watch(self, name: str, read: Callable[[], int]) -> None:
+        """Report a counter kept elsewhere, as its growth from now on."""
+        with self.lock:
+            self.watched[name] = (read, read())
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            counters = dict(self.counters)
+            for name, (read, start) in self.watched.items():
+                counters[name] = read() - start
+            return {
+                'elapsed_s': elapsed,
+                'stages': {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+                'counters': counters,
+                'per_minute': {name: value / elapsed * 60 for name, value in counters.items()} if elapsed else {},
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.watched = {name: (read, read()) for name, (read, _) in self.watched.items()}
+            self.started = time.perf_counter()
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """Write a snapshot as JSON, in the stage layout benchmark.py compares."""
+        path = path or f"{self.name or 'tool'}_stats_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        data = self.snapshot()
+        data['meta'] = {'tool': self.name, 'exported': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        try:
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2)
+            return path
+        except Exception as e:
+            logging.error(f"Error exporting stats: {e}")
+            return None
+
+
+def span(metrics: Optional[Metrics], stage: str) -> ContextManager:
+    """metrics.span(stage), or nothing when the caller is not instrumented."""
+    return metrics.span(stage) if metrics is not None else contextlib.nullcontext()
+
+
+def format_stats(snapshot: dict) -> str:
+    """Compact text for a tool's stats panel."""
+    stages = snapshot['stages']
+    lines = [f"{'stage':10s} {'p50 ms':>9s} {'p95 ms':>9s} {'count':>7s}"]
+    for stage in STAGES + sorted(set(stages) - set(STAGES)):
+        if stage in stages:
+            stats = stages[stage]
+            lines.append(f"{stage:10s} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['runs']:7d}")
+    counters = snapshot['counters']
+    cycles_per_minute = snapshot['per_minute'].get('cycles', 0.0)
+    summary = f"cycles/min {cycles_per_minute:.1f}"
+    if 'ocr_calls' in counters or 'ocr_cache_hits' in counters:
+        summary += f"   OCR calls {counters.get('ocr_calls', 0)}   cache hits {counters.get('ocr_cache_hits', 0)}"
+    if counters.get('ocr_rescans'):
+        summary += f"   rescans {counters['ocr_rescans']}"
+    lines.append(summary)
+    return '\n'.join(lines)
@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from lazy_loading import lazy_import
+
+keyboard = lazy_import('keyboard')
+
+KILL_EVENT = '-KILL-'
+KILL_KEY = 'p'
+
+
+def pause(seconds: float, stop_event: Optional[threading.Event] = None) -> bool:
+    """Sleep that a set stop_event cuts short; returns False if it did."""
+    if stop_event is None:
+        time.sleep(seconds)
+        return True
+    return not stop_event.wait(seconds)
+
+
+class KillSwitch:
+    """Global hotkey that stops the running worker from the keyboard hook thread.
+
+    The key press sets the armed stop event right away, so a worker blocked
+    in an Event.wait returns immediately instead of at the GUI's next poll.
+    The window gets KILL_EVENT afterwards to join the worker and report it;
+    without a window, notify is called instead.
+    """
+
+    def __init__(self, window=None, key: str = KILL_KEY, notify: Optional[Callable[[], None]] = None):
+        self.window = window
+        self.notify = notify
+        self.key = key
+        self.armed: Optional[threading.Event] = None
+        self.lock = threading.Lock()
+        self.hook = None
+        self.pressed_at = 0.0
+
+    def start(self) -> None:
+        try:
+            self.hook = keyboard.on_press_key(self.key, self.trigger)
+        except Exception as e:
+            logging.error(f"Error installing kill switch hotkey: {e}")
+
+    def arm(self, stop_event: threading.Event) -> None:
+        with self.lock:
+            self.armed = stop_event
+
+    def trigger(self, key_event=None) -> None:
+        with self.lock:
+            stop_event, self.armed = self.armed, None
+        # Key repeat and presses while nothing runs are ignored
+        if stop_event is None or stop_event.is_set():
+            return
+        self.pressed_at = time.perf_counter()
+        stop_event.set()
+        try:
+            if self.window is not None:
+                self.window.write_event_value(KILL_EVENT, None)
+            elif self.notify is not None:
+                self.notify()
+        except Exception as e:
+            logging.error(f"Error notifying window of kill switch: {e}")
+
+    def close(self) -> None:
+        if self.hook is None:
+            return
+        try:
+            keyboard.unhook(self.hook)
+        except Exception as e:
+            logging.error(f"Error removing kill switch hotkey: {e}")
+        self.hook = None
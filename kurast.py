@@ -1,28 +1,34 @@
 import PySimpleGUI as sg
-import pyautogui
-import pytesseract
-import cv2
-import numpy as np
 import json
 import os
 import threading
 import time
-import keyboard
 import logging
 import tkinter as tk
-from PIL import ImageGrab, ImageTk
-from typing import Dict, List, Tuple, Optional
+from typing import Deque, List, Tuple, Optional
 from dataclasses import dataclass, asdict
-import re 
+import glob
+from collections import deque
 from threading import Lock
 from shared_config import apply_theme
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+from frame_source import Frame, FrameSource, capture_screen_region, get_frame_source, intersect_region
+from template_matching import TemplateCache, get_template_cache, match_templates, match_templates_multiscale, scale_range
+from engine_service import EngineService, get_engine_service
+from screen_settle import SettleDetector
+from timing_controller import TimingController
+from lazy_loading import lazy_import
+from status_channel import STATUS_EVENT, OutputConsole, StatusChannel
+from instrumentation import Metrics, format_stats, span
+from logging_setup import setup_logging
+from kill_switch import KILL_EVENT, KillSwitch, pause
+
+# Loaded on first use, not when the tool is imported
+pyautogui = lazy_import('pyautogui')
 
 CONFIG_FILE = 'kurast_config.json'
+TRACK_MARGIN = 40  # Pixels around a recent match searched before the whole scan region
+TRACK_HISTORY = 4  # Recent match positions remembered
 
-logging.basicConfig(filename='enchant_assistant.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 @dataclass
 class KurastConfig:
@@ -33,42 +39,192 @@ class KurastConfig:
     click_delay: float = 0.1
     loop_delay: float = 0.5
     confidence: float = 0.8
+    target_images: List[str] = None  # Extra portal captures or glob patterns, matched together with target_image
+    wait_for_settle: bool = True  # click_delay becomes a timeout, continue once the screen settles
+    adaptive_timing: bool = True  # Shrink that timeout toward the measured screen latency
+    move_duration: float = 0.2  # Mouse glide to each click, 0 jumps straight there
+    hover_delay: float = 0.1  # Pause on a spot before clicking it
+    track_portal: bool = True  # Search around recent matches and hint_positions before the whole region
+    hint_positions: List[Tuple[int, int]] = None  # Screen spots where the portal usually shows up
+    min_scale: float = 1.0  # Portal sizes matched relative to the captures, e.g. 0.8 to 1.25 for other
+    max_scale: float = 1.0  # resolutions and zoom; each extra size slows a search that finds nothing
 
     def __post_init__(self):
         if self.target_image is None:
             self.target_image = ""
+        if self.target_images is None:
+            self.target_images = []
+        if self.hint_positions is None:
+            self.hint_positions = []
+
+def resolve_target_images(config: KurastConfig) -> List[str]:
+    paths = []
+    for entry in [config.target_image] + list(config.target_images):
+        entry = entry.strip()
+        if not entry:
+            continue
+        matches = sorted(glob.glob(entry)) if glob.has_magic(entry) else [entry]
+        paths.extend(path for path in matches if path not in paths)
+    return paths
 
 def find_image_in_region(template_path: str, region: Tuple[int, int, int, int], confidence: float = 0.8) -> Optional[Tuple[int, int]]:
+    match = find_any_image_in_region([template_path], region, confidence)
+    return match[0] if match else None
+
+def find_any_image_in_region(template_paths: List[str], region: Tuple[int, int, int, int],
+                             confidence: float = 0.8,
+                             frame_source: Optional[FrameSource] = None,
+                             template_cache: Optional[TemplateCache] = None,
+                             metrics: Optional[Metrics] = None,
+                             scales: Tuple[float, ...] = (1.0,),
+                             stop_event: Optional[threading.Event] = None,
+                             frame: Optional[Frame] = None) -> Optional[Tuple[Tuple[int, int], str, float]]:
+    """Best match of any template at any of scales in the region: (screen center, template path, score).
+
+    The region is captured now unless it comes from an earlier frame.
+    """
     try:
-        # Capture the screen region
-        screenshot = np.array(pyautogui.screenshot(region=region))
-        screenshot_bgr = cv2.cvtColor(screenshot, cv2.COLOR_RGB2BGR)
+        if frame is not None:
+            screenshot_bgr = frame.region_bgr(region)
+        else:
+            # Capture the screen region
+            with span(metrics, 'capture'):
+                screenshot_bgr = capture_screen_region(region, frame_source)
+        if screenshot_bgr is None:
+            return None
         
-        # Read the template image
-        template = cv2.imread(template_path)
-        if template is None:
-            logging.error(f"Could not load template image: {template_path}")
+        # Decoded once and reused until the files change
+        template_cache = template_cache or get_template_cache()
+        pyramids = []
+        for template_path in template_paths:
+            pyramid = template_cache.pyramid(template_path, scales)
+            if not pyramid:
+                logging.error(f"Could not load template image: {template_path}")
+                continue
+            pyramids.append(pyramid)
+        if not pyramids:
             return None
-            
-        # Get template dimensions
-        h, w = template.shape[:2]
         
-        # Perform template matching
-        result = cv2.matchTemplate(screenshot_bgr, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        # All templates are scored in one pass sharing the frame's grayscale pyramid
+        with span(metrics, 'match'):
+            if len(scales) > 1:
+                match = match_templates_multiscale(screenshot_bgr, pyramids, confidence, stop_event=stop_event)
+            else:
+                match = match_templates(screenshot_bgr, [pyramid[0] for pyramid in pyramids], stop_event=stop_event,
+                                        confidence=confidence)
+        if match is None:
+            return None
+        max_val, max_loc, template = match
         
         if max_val >= confidence:
             # Return the center point of the match, relative to screen
+            h, w = template.image.shape[:2]
             match_x = region[0] + max_loc[0] + w//2
             match_y = region[1] + max_loc[1] + h//2
-            return (match_x, match_y)
+            return (match_x, match_y), template.path, max_val
         
         return None
     except Exception as e:
         logging.error(f"Error in image matching: {e}")
         return None
 
-def highlight_click(x: int, y: int, duration: float = 0.5):
+class PortalTracker:
+    """Screen positions and capture of recent portal matches, kept while the tool is open."""
+
+    def __init__(self):
+        self.recent: Deque[Tuple[int, int]] = deque(maxlen=TRACK_HISTORY)
+        self.last_template: Optional[str] = None
+        self.lock = Lock()
+
+    def remember(self, position: Tuple[int, int]) -> None:
+        with self.lock:
+            if position in self.recent:
+                self.recent.remove(position)
+            self.recent.appendleft(position)
+
+    def remember_template(self, template_path: str) -> None:
+        with self.lock:
+            self.last_template = template_path
+
+    def ordered(self, template_paths: List[str]) -> List[str]:
+        """template_paths with the capture that matched last first."""
+        with self.lock:
+            last = self.last_template
+        if last not in template_paths:
+            return list(template_paths)
+        return [last] + [path for path in template_paths if path != last]
+
+    def windows(self, hints: List[Tuple[int, int]], template_size: Tuple[int, int],
+                region: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int]]:
+        """Parts of region around each recent match, then around each hint, large enough for the template."""
+        with self.lock:
+            centers = list(self.recent)
+        width, height = template_size
+        windows = []
+        for x, y in centers + [tuple(hint) for hint in hints]:
+            window = intersect_region((x - width // 2 - TRACK_MARGIN, y - height // 2 - TRACK_MARGIN,
+                                       width + 2 * TRACK_MARGIN, height + 2 * TRACK_MARGIN), region)
+            if window is not None and window[2] >= width and window[3] >= height and window not in windows:
+                windows.append(window)
+        return windows
+
+    def clear(self) -> None:
+        with self.lock:
+            self.recent.clear()
+            self.last_template = None
+
+
+_portal_tracker = PortalTracker()
+
+
+def get_portal_tracker() -> PortalTracker:
+    return _portal_tracker
+
+def find_tracked_image_in_region(template_paths: List[str], region: Tuple[int, int, int, int],
+                                 confidence: float = 0.8,
+                                 frame_source: Optional[FrameSource] = None,
+                                 template_cache: Optional[TemplateCache] = None,
+                                 metrics: Optional[Metrics] = None,
+                                 tracker: Optional[PortalTracker] = None,
+                                 hints: Optional[List[Tuple[int, int]]] = None,
+                                 scales: Tuple[float, ...] = (1.0,),
+                                 stop_event: Optional[threading.Event] = None) -> Optional[Tuple[Tuple[int, int], str, float]]:
+    """find_any_image_in_region that first looks around recent matches and hints.
+
+    The region is grabbed once and each window is matched on a view of that
+    frame; the whole frame is searched only when none of them holds a match,
+    so nothing is missed that a full search would find.
+    """
+    tracker = tracker or get_portal_tracker()
+    template_cache = template_cache or get_template_cache()
+    with span(metrics, 'capture'):
+        frame = (frame_source or get_frame_source()).grab([region])
+    if frame is None:
+        return None
+    templates = [template for template in map(template_cache.get, template_paths) if template is not None]
+    if templates:
+        # Windows fit the largest scale searched
+        size = (int(max(template.image.shape[1] for template in templates) * max(scales)),
+                int(max(template.image.shape[0] for template in templates) * max(scales)))
+        for window in tracker.windows(hints or [], size, region):
+            if stop_event is not None and stop_event.is_set():
+                return None
+            match = find_any_image_in_region(template_paths, window, confidence, frame_source,
+                                             template_cache, metrics, scales, stop_event, frame)
+            if match:
+                if metrics is not None:
+                    metrics.count('tracked_hits')
+                tracker.remember(match[0])
+                return match
+    if stop_event is not None and stop_event.is_set():
+        return None
+    match = find_any_image_in_region(template_paths, region, confidence, frame_source, template_cache, metrics,
+                                     scales, stop_event, frame)
+    if match:
+        tracker.remember(match[0])
+    return match
+
+def highlight_click(x: int, y: int, duration: float = 0.5, stop_event: Optional[threading.Event] = None):
     try:
         # Create a small overlay window
         root = tk.Tk()
@@ -88,64 +244,122 @@ def highlight_click(x: int, y: int, duration: float = 0.5):
         
         # Schedule the window to close
         root.after(int(duration * 1000), root.destroy)
+        if stop_event is not None:
+            def close_on_stop():
+                if stop_event.is_set():
+                    root.destroy()
+                else:
+                    root.after(5, close_on_stop)
+            root.after(5, close_on_stop)
         root.mainloop()
     except Exception as e:
         logging.error(f"Error highlighting click: {e}")
 
 class KurastProcess(threading.Thread):
-    def __init__(self, config: KurastConfig, window: sg.Window):
+    def __init__(self, config: KurastConfig, status: StatusChannel,
+                 frame_source: Optional[FrameSource] = None, engine: Optional[EngineService] = None):
         super().__init__()
         self.config = config
-        self.window = window
+        self.status = status
+        self.engine = engine or get_engine_service()
+        self.frame_source = frame_source or self.engine.frame_source
+        self.input = self.engine.input
+        # Matching stops at the first capture that reaches confidence, so the last match is tried first
+        self.target_images = get_portal_tracker().ordered(resolve_target_images(config))
+        self.tracker = get_portal_tracker() if config.track_portal else None
+        self.scales = scale_range(config.min_scale, config.max_scale)
+        self.metrics = self.engine.instrument(Metrics('kurast'))
         self.stop_event = threading.Event()
+        self.settle = SettleDetector(self.frame_source, config.wait_for_settle,
+                                     stop_event=self.stop_event)
+        self.timing = TimingController('kurast', self.settle, config.adaptive_timing, self.metrics)
         self.keyboard_lock = Lock()
 
     def run(self) -> None:
         while not self.stop_event.is_set():
             try:
-                # Look for the portal target image
-                match_pos = find_image_in_region(
-                    self.config.target_image,
-                    self.config.scan_region,
-                    self.config.confidence
-                )
-                
-                if match_pos:
-                    # Show where it's going to click
-                    highlight_click(*match_pos)
-                    # Move mouse and click portal target
-                    pyautogui.moveTo(match_pos[0], match_pos[1], duration=0.2)
-                    time.sleep(0.1)
-                    pyautogui.click()
-                    time.sleep(self.config.click_delay)
-                    
-                    # Right click tribute spot
-                    if self.config.tribute_spot != (0, 0):
-                        self.window.write_event_value('-UPDATE-', f"Moving to tribute spot {self.config.tribute_spot}")
-                        pyautogui.moveTo(self.config.tribute_spot[0], self.config.tribute_spot[1], duration=0.2)
-                        time.sleep(0.1)
-                        pyautogui.click(button='right')
-                        time.sleep(self.config.click_delay)
-                    
-                    # Click portal button
-                    if self.config.portal_button != (0, 0):
-                        pyautogui.moveTo(self.config.portal_button[0], self.config.portal_button[1], duration=0.2)
-                        time.sleep(0.1)
-                        pyautogui.click()
-                        time.sleep(self.config.click_delay)
-                    
-                    self.window.write_event_value('-UPDATE-', 
-                        f"Completed portal sequence")
-                    self.stop()
-                    return
-                else:
-                    self.window.write_event_value('-UPDATE-', "Portal target not found")
-                
-                time.sleep(self.config.loop_delay)
+                with self.metrics.span('cycle'):
+                    self.run_cycle()
+                self.metrics.count('cycles')
             except Exception as e:
                 logging.error(f"Error in Kurast process: {e}")
-                self.window.write_event_value('-UPDATE-', f"Error occurred: {e}")
-                time.sleep(1)
+                self.status.post(f"Error occurred: {e}")
+                self.stop_event.wait(1)
+        self.timing.save()
+
+    def run_cycle(self) -> None:
+        # Look for any of the portal target images
+        if self.tracker is not None:
+            match = find_tracked_image_in_region(
+                self.target_images,
+                self.config.scan_region,
+                self.config.confidence,
+                self.frame_source,
+                self.engine.templates,
+                self.metrics,
+                self.tracker,
+                self.config.hint_positions,
+                self.scales,
+                self.stop_event
+            )
+        else:
+            match = find_any_image_in_region(
+                self.target_images,
+                self.config.scan_region,
+                self.config.confidence,
+                self.frame_source,
+                self.engine.templates,
+                self.metrics,
+                self.scales,
+                self.stop_event
+            )
+        
+        if match:
+            match_pos, template_path, score = match
+            self.status.post(f"Matched {os.path.basename(template_path)} ({score:.2f})")
+            # Kept past this run, every Start builds a new process
+            get_portal_tracker().remember_template(template_path)
+            self.target_images = get_portal_tracker().ordered(self.target_images)
+            # Show where it's going to click
+            with self.metrics.span('highlight'):
+                highlight_click(*match_pos, stop_event=self.stop_event)
+            # Move mouse and click portal target
+            if not self.move_and_click('portal', match_pos):
+                return
+            
+            # Right click tribute spot
+            if self.config.tribute_spot != (0, 0):
+                self.status.post(f"Moving to tribute spot {self.config.tribute_spot}")
+                if not self.move_and_click('tribute', self.config.tribute_spot, 'right'):
+                    return
+            
+            # Click portal button
+            if self.config.portal_button != (0, 0):
+                if not self.move_and_click('portal_button', self.config.portal_button):
+                    return
+            
+            self.status.post(f"Completed portal sequence")
+            self.stop()
+            return
+        else:
+            self.status.post("Portal target not found")
+        
+        with self.metrics.span('wait'):
+            self.settle.sleep(self.config.loop_delay)
+
+    def move_and_click(self, action: str, position: Tuple[int, int], button: str = 'left') -> bool:
+        """Move to position, click and wait for the screen; False if stopped before the click."""
+        reference = self.settle.sample(self.config.scan_region)
+        with self.metrics.span('move'):
+            moved = self.input.move_to(*position, self.config.move_duration, self.stop_event) and \
+                pause(self.config.hover_delay, self.stop_event)
+        if not moved:
+            return False
+        with self.metrics.span('click'):
+            self.input.click(button=button, stop_event=self.stop_event)
+        with self.metrics.span('wait'):
+            self.timing.wait(action, self.config.scan_region, self.config.click_delay, reference)
+        return True
 
     def stop(self) -> None:
         with self.keyboard_lock:
@@ -167,6 +381,11 @@ def create_main_window(config: KurastConfig) -> sg.Window:
          sg.FileBrowse(file_types=(("PNG Files", "*.png"), ("All Files", "*.*")),
                       font=('Helvetica', 12)),
          sg.Button("Capture", key='CAPTURE_TARGET', font=('Helvetica', 12))],
+        [sg.Text("Extra Target Images:", font=('Helvetica', 12)), 
+         sg.Input(key='TARGET_IMAGES', default_text=','.join(config.target_images), 
+                 size=(50, 1),
+                 font=('Helvetica', 12),
+                 tooltip="Comma-separated paths or patterns, e.g. images/target_*.png")],
         [sg.Text("Tribute Spot:", font=('Helvetica', 12)),
          sg.Input(key='TRIBUTE_SPOT', 
                  default_text=','.join(map(str, config.tribute_spot)),
@@ -190,9 +409,11 @@ def create_main_window(config: KurastConfig) -> sg.Window:
         [sg.Button("Save Configuration", font=('Helvetica', 12)), 
          sg.Button("Start Process", font=('Helvetica', 12)), 
          sg.Button("Stop Process", font=('Helvetica', 12)), 
+         sg.Button("Export Stats", font=('Helvetica', 12)), 
          sg.Button("Exit", font=('Helvetica', 12))],
         [sg.Multiline(size=(70, 10), key='OUTPUT', disabled=True, 
-                     font=('Courier', 11))]
+                     font=('Courier', 11))],
+        [sg.Text("", key='STATS', font=('Courier', 9), size=(70, 11))]
     ]
     
     return sg.Window("Kurast Helper", 
@@ -203,7 +424,7 @@ def create_main_window(config: KurastConfig) -> sg.Window:
 def validate_config(config: KurastConfig) -> bool:
     if config.scan_region == (0, 0, 0, 0):
         return False
-    if config.target_image == "":
+    if not resolve_target_images(config):
         return False
     return True
 
@@ -226,16 +447,6 @@ def load_config() -> KurastConfig:
         logging.error(f"Error loading configuration: {e}")
     return default_config
 
-def click_button(x: int, y: int, delay: float = 0.1) -> None:
-    try:
-        # Move mouse smoothly to position
-        pyautogui.moveTo(x, y, duration=0.2)  # 0.2 seconds for smooth movement
-        time.sleep(0.1)  # Small pause after movement
-        pyautogui.click()
-        time.sleep(delay)
-    except Exception as e:
-        logging.error(f"Error clicking button at ({x}, {y}): {e}")
-
 def get_scan_region():
     try:
         root = tk.Tk()
@@ -403,15 +614,20 @@ def capture_target_image(window: sg.Window) -> Optional[str]:
         logging.error(f"Error capturing target image: {e}")
         return None
 
-def main():
+def main(engine: Optional[EngineService] = None):
+    setup_logging('kurast')
     apply_theme()
     config = load_config()
     window = create_main_window(config)
+    console = OutputConsole(window['OUTPUT'])
+    status = StatusChannel(window)
     kurast_process = None
-    keyboard_lock = Lock()
+    kill_switch = KillSwitch(window)
+    metrics = None  # Stats of the latest run, kept after it stops
+    kill_switch.start()
 
     while True:
-        event, values = window.read(timeout=100)
+        event, values = window.read()
         if event == sg.WINDOW_CLOSED or event == "Exit":
             break
         elif event.startswith('GET_'):
@@ -432,7 +648,7 @@ def main():
                 filename = capture_target_image(window)
                 if filename:
                     window['TARGET_IMAGE'].update(filename)
-                    window['OUTPUT'].print(f"Captured target image: {filename}")
+                    console.print(f"Captured target image: {filename}")
             else:
                 window.hide()
                 time.sleep(2)  # Give user time to position mouse
@@ -443,6 +659,7 @@ def main():
             try:
                 scan_region = tuple(map(int, values['SCAN_REGION'].split(',')))
                 target_image = values['TARGET_IMAGE']
+                target_images = [path.strip() for path in values['TARGET_IMAGES'].split(',') if path.strip()]
                 tribute_spot = tuple(map(int, values['TRIBUTE_SPOT'].split(',')))
                 portal_button = tuple(map(int, values['PORTAL_BUTTON'].split(',')))
                 click_delay = float(values['CLICK_DELAY'])
@@ -456,50 +673,60 @@ def main():
                     portal_button=portal_button,
                     click_delay=click_delay,
                     loop_delay=loop_delay,
-                    confidence=confidence
+                    confidence=confidence,
+                    target_images=target_images,
+                    wait_for_settle=config.wait_for_settle,
+                    adaptive_timing=config.adaptive_timing,
+                    move_duration=config.move_duration,
+                    hover_delay=config.hover_delay,
+                    track_portal=config.track_portal,
+                    hint_positions=config.hint_positions,
+                    min_scale=config.min_scale,
+                    max_scale=config.max_scale
                 )
                 if validate_config(new_config):
                     save_config(new_config)
                     config = new_config
-                    window['OUTPUT'].print(f"Configuration saved successfully. Tribute spot: {tribute_spot}")
+                    console.print(f"Configuration saved successfully. Tribute spot: {tribute_spot}")
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
             except ValueError as e:
-                window['OUTPUT'].print(f"Invalid input. Please check all fields. Error: {e}")
+                console.print(f"Invalid input. Please check all fields. Error: {e}")
         elif event == "Start Process":
             if kurast_process is None or not kurast_process.is_alive():
                 if validate_config(config):
-                    kurast_process = KurastProcess(config, window)
+                    kurast_process = KurastProcess(config, status, engine=engine)
+                    kill_switch.arm(kurast_process.stop_event)
+                    metrics = kurast_process.metrics
                     kurast_process.start()
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
         elif event == "Stop Process":
             if kurast_process and kurast_process.is_alive():
                 kurast_process.stop()
                 kurast_process.join()
-                window['OUTPUT'].print("Process stopped.")
-        elif event == '-UPDATE-':
-            window['OUTPUT'].print(values['-UPDATE-'])
-        
-        try:
-            with keyboard_lock:
-                if keyboard.is_pressed('p'):
-                    if kurast_process and kurast_process.is_alive():
-                        kurast_process.stop()
-                        kurast_process.join(timeout=1.0)
-                        if kurast_process.is_alive():
-                            kurast_process.join()
-                        window['OUTPUT'].print("Process terminated by user (P key pressed)")
-                        kurast_process = None
-                    time.sleep(0.1)
-        except Exception as e:
-            logging.error(f"Error in keyboard handling: {e}")
-            window['OUTPUT'].print(f"Error in keyboard handling: {e}")
+                console.print("Process stopped.")
+        elif event == STATUS_EVENT:
+            console.write(status.drain())
+            if metrics is not None:
+                window['STATS'].update(format_stats(metrics.snapshot()))
+        elif event == "Export Stats":
+            path = metrics.export() if metrics is not None else None
+            console.print(f"Stats exported to {path}" if path else "No stats to export yet.")
+        elif event == KILL_EVENT:
+            # The hotkey hook already stopped the process, only wait for it to finish
+            if kurast_process:
+                kurast_process.join()
+                stopped_ms = (time.perf_counter() - kill_switch.pressed_at) * 1000
+                console.print(f"Process terminated by user (P key pressed), stopped in {stopped_ms:.0f} ms")
+                kurast_process = None
 
     if kurast_process and kurast_process.is_alive():
         kurast_process.stop()
         kurast_process.join(timeout=1.0)
 
+    kill_switch.close()
+    status.close()
     window.close()
 
 if __name__ == "__main__":
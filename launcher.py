@@ -1,10 +1,26 @@
+import time
+STARTED = time.perf_counter()
+
 import PySimpleGUI as sg
 import sys
 import os
-import importlib.util
+import importlib
+import threading
+import logging
 from shared_config import load_theme, save_theme, apply_theme
+from logging_setup import LEVELS, load_levels, set_log_level, setup_logging
 from typing import Tuple
 
+TOOL_MODULES = {
+    'Kurast Helper': 'kurast',
+    'Barter Assistant': 'barter',
+    'Enchant Helper': 'enchant',
+    'Masterwork Assistant': 'masterwork'
+}
+
+# Set to print the time to first window and exit, used by `benchmark.py startup`
+STARTUP_BENCHMARK_ENV = 'D4_STARTUP_BENCHMARK'
+
 def get_resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -21,6 +37,9 @@ def create_main_window() -> sg.Window:
         [sg.Text("Select theme:", font=('Helvetica', 12)),
          sg.Combo(themes, key='THEME', default_value=current_theme, 
                  enable_events=True, font=('Helvetica', 12), size=(30, 1))],
+        [sg.Text("Log level:", font=('Helvetica', 12)),
+         sg.Combo(LEVELS, key='LOG_LEVEL', default_value=load_levels()['level'], readonly=True,
+                 enable_events=True, font=('Helvetica', 12), size=(10, 1))],
         [sg.Text("Select tool to launch:", font=('Helvetica', 12))],
         [sg.Combo(
             ['Kurast Helper', 'Barter Assistant', 'Enchant Helper', 'Masterwork Assistant'],
@@ -39,62 +58,82 @@ def create_main_window() -> sg.Window:
                     finalize=True,
                     keep_on_top=False)
 
-def import_module_from_file(module_name, file_path):
-    try:
-        spec = importlib.util.spec_from_file_location(module_name, file_path)
-        if spec is None:
-            return None
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return module
-    except Exception as e:
-        print(f"Error importing module: {e}")
-        return None
+def import_tool_module(module_name: str):
+    # Normal imports cache bytecode and return the already loaded module on later launches
+    tool_dir = os.path.dirname(get_resource_path(f"{module_name}.py"))
+    if tool_dir not in sys.path:
+        sys.path.insert(0, tool_dir)
+    return importlib.import_module(module_name)
 
-def launch_tool(tool_name: str) -> bool:
-    tool_map = {
-        'Kurast Helper': 'kurast',
-        'Barter Assistant': 'barter',
-        'Enchant Helper': 'enchant',
-        'Masterwork Assistant': 'masterwork'
-    }
-    
-    if tool_name not in tool_map:
+class ToolLoader:
+    """Imports the engine and every tool on a background thread once the launcher window is shown."""
+
+    def __init__(self):
+        self.engine = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.preload, name='tool-preload', daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def get_engine(self):
+        with self.lock:
+            if self.engine is None:
+                from engine_service import get_engine_service
+                self.engine = get_engine_service()
+            return self.engine
+
+    def preload(self) -> None:
+        try:
+            engine = self.get_engine()
+            for module_name in TOOL_MODULES.values():
+                import_tool_module(module_name)
+            from lazy_loading import load_pending
+            load_pending()
+            engine.warm_up()
+        except Exception as e:
+            # The tool is imported again on launch, which reports the error
+            logging.error(f"Error preloading tools: {e}")
+
+def launch_tool(tool_name: str, loader: ToolLoader) -> bool:
+    if tool_name not in TOOL_MODULES:
         return False
         
     try:
-        module_name = tool_map[tool_name]
+        module_name = TOOL_MODULES[tool_name]
         file_path = get_resource_path(f"{module_name}.py")
         
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Tool file not found: {file_path}")
             
-        # Debug information
-        print(f"Loading module from: {file_path}")
-        print(f"Resource path base: {os.path.dirname(file_path)}")
-        print(f"Available files: {os.listdir(os.path.dirname(file_path))}")
-        
-        with open(file_path, 'r') as f:
-            code = compile(f.read(), file_path, 'exec')
-            module_globals = {}
-            exec(code, module_globals)
+        module = import_tool_module(module_name)
             
-        if 'main' not in module_globals:
+        if not hasattr(module, 'main'):
             raise ImportError(f"No main function found in {module_name}")
             
-        module_globals['main']()
+        # The tool runs on the launcher's engine, already warm from earlier tools
+        module.main(engine=loader.get_engine())
         return True
         
     except Exception as e:
         import traceback
         error_msg = f"Error launching {tool_name}:\n{str(e)}\n\n{traceback.format_exc()}"
         print(error_msg)  # Print to console for debugging
+        logging.error(error_msg)
         sg.popup_error(error_msg)
         return False
 
 def main():
+    setup_logging()
     apply_theme()
     window = create_main_window()
+    if os.environ.get(STARTUP_BENCHMARK_ENV):
+        print(f"STARTUP_MS {(time.perf_counter() - STARTED) * 1000:.1f}")
+        window.close()
+        return
+    # Tools, OCR backend and templates load while the launcher window is open
+    loader = ToolLoader()
+    loader.start()
     
     while True:
         event, values = window.read()
@@ -108,15 +147,21 @@ def main():
             window.close()
             window = create_main_window()
             
+        if event == 'LOG_LEVEL':
+            set_log_level(values['LOG_LEVEL'])
+            
         if event == 'Launch':
             tool_name = values['TOOL']
             window['STATUS'].update("Launching " + tool_name)
-            if not launch_tool(tool_name):
+            if not launch_tool(tool_name, loader):
                 window['STATUS'].update("Failed to launch " + tool_name)
             else:
                 window['STATUS'].update(tool_name + " launched successfully")
+            setup_logging()  # Back to the launcher's own log
     
     window.close()
+    if loader.engine is not None:
+        loader.engine.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
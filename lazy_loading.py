@@ -0,0 +1,43 @@
+import importlib.util
+import logging
+import sys
+import threading
+import types
+from typing import List
+
+_pending: List[str] = []
+_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Import a module whose code only runs on first attribute access.
+
+    Meant for heavy pure-Python dependencies that are only used inside
+    functions, so importing a tool does not pay for them up front. A missing
+    module still fails at import time.
+    """
+    with _lock:
+        if name in sys.modules:
+            return sys.modules[name]
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        _pending.append(name)
+        return module
+
+
+def load_pending() -> None:
+    """Finish loading every lazy module, e.g. on a background thread before first use."""
+    with _lock:
+        names = list(_pending)
+        _pending.clear()
+    for name in names:
+        try:
+            getattr(sys.modules[name], '__dict__')
+        except Exception as e:
+            logging.error(f"Error loading {name}: {e}")
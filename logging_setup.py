@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Dict, Optional
+
+LOG_CONFIG_FILE = 'logging_config.json'
+LOG_FILES = {
+    'barter': 'restock_assistant.log',
+    'enchant': 'enchant_assistant.log',
+    'masterwork': 'masterwork_assistant.log',
+    'kurast': 'kurast_assistant.log',
+}
+DEFAULT_LOG_FILE = 'd4_assistant.log'  # Launcher and anything logged before a tool opened
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_BYTES = 1024 * 1024  # Size of one log file before it is rotated
+BACKUP_COUNT = 3  # Rotated files kept per tool
+QUEUE_SIZE = 10000  # Records waiting for the writer; more are dropped rather than block a worker
+LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional['ToolQueueHandler'] = None
+_active_tool: Optional[str] = None
+_levels: Dict[str, int] = {'level': logging.INFO}
+
+
+class ToolQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread, tagged with the tool that logged them.
+
+    Tools and the shared engine modules log through the root logger, so a
+    record belongs to the tool whose window is open when it is logged, and
+    that tool's level decides whether it is kept. Enqueueing never blocks:
+    when the writer falls behind, records are counted and dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        top_level = record.name.split('.')[0]
+        tool = top_level if top_level in LOG_FILES else _active_tool
+        if record.levelno < _levels.get(tool, _levels['level']):
+            return False
+        record.tool = tool
+        return super().handle(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ToolFileHandler(logging.Handler):
+    """Writes every record to the rotating log file of its tool, on the writer thread."""
+
+    def __init__(self, queue_handler: ToolQueueHandler):
+        super().__init__()
+        self.queue_handler = queue_handler
+        self.files: Dict[Optional[str], logging.Handler] = {}
+        self.formatter = logging.Formatter(LOG_FORMAT)
+
+    def file_for(self, tool: Optional[str]) -> logging.Handler:
+        handler = self.files.get(tool)
+        if handler is None:
+            handler = logging.handlers.RotatingFileHandler(
+                LOG_FILES.get(tool, DEFAULT_LOG_FILE), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT,
+                encoding='utf-8', delay=True)
+            handler.setFormatter(self.formatter)
+            self.files[tool] = handler
+        return handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        handler = self.file_for(getattr(record, 'tool', None))
+        dropped, self.queue_handler.dropped = self.queue_handler.dropped, 0
+        if dropped:
+            handler.handle(logging.makeLogRecord({
+                'name': 'logging_setup', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"{dropped} log records dropped, the log writer fell behind"}))
+        handler.handle(record)
+
+    def close(self) -> None:
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+def load_levels() -> Dict[str, str]:
+    """Configured levels: 'level' for everything plus optional per-tool overrides."""
+    try:
+        with open(LOG_CONFIG_FILE, 'r') as f:
+            config = json.load(f)
+        return {'level': config.get('level', 'INFO'), **config.get('tools', {})}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"Error loading {LOG_CONFIG_FILE}: {e}")
+    return {'level': 'INFO'}
+
+
+def apply_levels(levels: Dict[str, str]) -> None:
+    global _levels
+    resolved = {name: logging.getLevelName(level.upper()) for name, level in levels.items()}
+    _levels = {name: level for name, level in resolved.items() if isinstance(level, int)}
+    _levels.setdefault('level', logging.INFO)
+    # The root logger lets through what any tool wants, the queue handler filters per tool
+    logging.getLogger().setLevel(min(_levels.values()))
+
+
+def set_log_level(level: str, tool: Optional[str] = None) -> None:
+    """Change a level while running and keep it for the next start."""
+    levels = load_levels()
+    levels[tool or 'level'] = level
+    apply_levels(levels)
+    try:
+        with open(LOG_CONFIG_FILE, 'w') as f:
+            json.dump({'level': levels.pop('level'), 'tools': levels}, f)
+    except Exception as e:
+        logging.error(f"Error saving {LOG_CONFIG_FILE}: {e}")
+
+
+def stop_logging() -> None:
+    """Write out every queued record; registered to run at exit."""
+    global _listener, _queue_handler
+    with _lock:
+        listener, _listener = _listener, None
+        if _queue_handler is not None:
+            logging.getLogger().removeHandler(_queue_handler)
+            _queue_handler = None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def setup_logging(tool: Optional[str] = None) -> logging.Logger:
+    """Send log records of this process to per-tool rotating files through a writer thread.
+
+    The first call replaces the root handlers; every call makes `tool` the
+    owner of untagged records from then on.
+    """
+    global _listener, _queue_handler, _active_tool
+    with _lock:
+        _active_tool = tool
+        if _listener is None:
+            log_queue = queue.Queue(QUEUE_SIZE)
+            _queue_handler = ToolQueueHandler(log_queue)
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(_queue_handler)
+            _listener = logging.handlers.QueueListener(log_queue, ToolFileHandler(_queue_handler))
+            _listener.start()
+            atexit.register(stop_logging)
+    apply_levels(load_levels())
+    return logging.getLogger(tool) if tool else logging.getLogger()
@@ -1,8 +1,4 @@
 import PySimpleGUI as sg
-import pyautogui
-import pytesseract
-import cv2
-import numpy as np
 import json
 import os
 import threading
@@ -10,21 +6,26 @@ import time
 import win32gui
 import win32api
 import win32con
-import keyboard
 import logging
 import tkinter as tk
-from PIL import ImageGrab, ImageTk
-from typing import Dict, List, Tuple, Optional
+from typing import Tuple, Optional
 from dataclasses import dataclass, asdict
-import re 
 from shared_config import apply_theme
+from frame_source import FrameSource
+from engine_service import EngineService, get_engine_service
+from screen_settle import SettleDetector
+from timing_controller import TimingController
+from text_roi import TextRoiCache
+from preprocess import PreprocessConfig, PreprocessPipeline
+from text_scan import scan_for_result
 import sys
+from status_channel import STATUS_EVENT, OutputConsole, StatusChannel
+from instrumentation import Metrics, format_stats
+from logging_setup import setup_logging
+from kill_switch import KILL_EVENT, KillSwitch
 
 CONFIG_FILE = 'upgrade_config.json'
 
-# Set up logging
-logging.basicConfig(filename='masterwork_assistant.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 @dataclass
 class Config:
@@ -36,6 +37,13 @@ class Config:
     scan_region: Tuple[int, int, int, int]
     target_word: str = "Dust"
     max_count: int = 3
+    wait_for_settle: bool = True  # Continue as soon as the scan region settles instead of fixed sleeps
+    adaptive_timing: bool = True  # Shrink those waits toward the measured screen latency
+    crop_text_lines: bool = False  # OCR only the text lines found inside the scan region
+    preprocess: dict = None  # PreprocessConfig fields: upscale, denoise, invert
+    ocr_config: str = ''  # Tesseract options, e.g. '--psm 7'; written by ocr_tuner.py
+    min_confidence: float = 0.0  # Words OCR'd below this confidence (0-100) are ignored when matching
+    rescan_confidence: float = 0.0  # A scan with a word below this is read again with other preprocessing, 0 never
 
 def load_config() -> Config:
     default_config = Config((0, 0), (0, 0), (0, 0), (0, 0), (0, 0), (0, 0, 0, 0))
@@ -58,125 +66,87 @@ def save_config(config: Config) -> None:
         json.dump(asdict(config), f)
     logging.info("Configuration saved successfully.")
 
-def capture_screen_region(region: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
-    try:
-        screenshot = pyautogui.screenshot(region=region)
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    except Exception as e:
-        logging.error(f"Error capturing screen region: {e}")
-        return None
-
-def preprocess_image(image: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-
-def scan_for_text(region: Tuple[int, int, int, int]) -> str:
-    image = capture_screen_region(region)
-    if image is None:
-        return ""
-    processed_image = preprocess_image(image)
-    try:
-        text = pytesseract.image_to_string(processed_image)
-        return text.strip()
-    except Exception as e:
-        logging.error(f"Error scanning for text: {e}")
-        return ""
-
-def click_button(x: int, y: int) -> None:
-    try:
-        pyautogui.click(x, y)
-    except Exception as e:
-        logging.error(f"Error clicking button at ({x}, {y}): {e}")
-
 class UpgradeProcess(threading.Thread):
-    def __init__(self, config: Config, window: sg.Window):
+    def __init__(self, config: Config, status: StatusChannel,
+                 frame_source: Optional[FrameSource] = None, engine: Optional[EngineService] = None):
         super().__init__()
         self.config = config
-        self.window = window
+        self.status = status
+        self.engine = engine or get_engine_service()
+        self.frame_source = frame_source or self.engine.frame_source
+        self.input = self.engine.input
+        self.matcher = self.engine.matcher([config.target_word])
+        self.metrics = self.engine.instrument(Metrics('masterwork'))
         self.stop_event = threading.Event()
+        self.settle = SettleDetector(self.frame_source, config.wait_for_settle,
+                                     stop_event=self.stop_event)
+        self.timing = TimingController('masterwork', self.settle, config.adaptive_timing, self.metrics)
+        self.text_roi = TextRoiCache() if config.crop_text_lines else None
+        self.pipeline = PreprocessPipeline(PreprocessConfig.from_dict(config.preprocess))
+        self.rescan_pipeline = PreprocessPipeline(self.pipeline.config.variant()) \
+            if config.rescan_confidence > 0 else None
+        self.read_words = config.min_confidence > 0 or self.rescan_pipeline is not None
+        self.count = 0
 
     def run(self) -> None:
-        count = 0
-        while count < self.config.max_count and not self.stop_event.is_set():
+        self.count = 0
+        while self.count < self.config.max_count and not self.stop_event.is_set():
             try:
-                self.perform_upgrade_cycle()
-                scanned_text = scan_for_text(self.config.scan_region)
-                self.window.write_event_value('-UPDATE-', f"Scanned text: {scanned_text}")
-                
-                if self.flexible_match(self.config.target_word, scanned_text):
-                    click_button(*self.config.close_button)
-                    count += 1
-                    self.window.write_event_value('-UPDATE-', f"Found match for '{self.config.target_word}'. Count: {count}")
-                else:
-                    self.reset_upgrade()
-                    count = 0
-                time.sleep(1)
+                with self.metrics.span('cycle'):
+                    self.run_cycle()
+                self.metrics.count('cycles')
             except Exception as e:
                 logging.error(f"Error in upgrade process: {e}")
-                self.window.write_event_value('-UPDATE-', f"Error occurred: {e}")
-                time.sleep(5)  # Wait before retrying
+                self.status.post(f"Error occurred: {e}")
+                self.stop_event.wait(5)  # Wait before retrying
+        self.timing.save()
 
         if not self.stop_event.is_set():
-            self.window.write_event_value('-UPDATE-', f"Found matches for '{self.config.target_word}' {self.config.max_count} times. Process complete.")
-
-    def flexible_match(self, target: str, text: str) -> bool:
-        # Convert both strings to lowercase for case-insensitive matching
-        target = target.lower()
-        text = text.lower()
+            self.status.post(f"Found matches for '{self.config.target_word}' {self.config.max_count} times. Process complete.")
+
+    def run_cycle(self) -> None:
+        self.perform_upgrade_cycle()
+        if self.stop_event.is_set():
+            return
+        with self.metrics.span('capture'):
+            frame = self.frame_source.grab([self.config.scan_region])
+        result = scan_for_result(self.config.scan_region, frame, self.engine.ocr, self.text_roi, self.pipeline,
+                                 self.config.ocr_config, self.metrics, self.config.rescan_confidence,
+                                 self.rescan_pipeline, self.read_words) if frame is not None else None
+        scanned_text = result.trusted_text(self.config.min_confidence) if result is not None else ""
+        self.status.post(f"Scanned text: {scanned_text}")
         
-        # Function to replace multiple spaces with a single space and strip
-        def normalize_spaces(s: str) -> str:
-            return re.sub(r'\s+', ' ', s).strip()
-        
-        # Normalize spaces in both strings
-        target = normalize_spaces(target)
-        text = normalize_spaces(text)
-        
-        # Split the target into words, preserving special characters
-        target_words = target.split()
-        
-        # Function to check if a word is partially in the text
-        def partial_word_match(word: str, text: str) -> bool:
-            # Check for exact match first
-            if word in text:
-                return True
-            
-            # Check for partial match (at least half of the word)
-            min_match_length = max(3, len(word) // 2)
-            for i in range(len(text) - min_match_length + 1):
-                if text[i:i+min_match_length] in word:
-                    return True
-            return False
-        
-        # Check if all target words are partially in the text, in a flexible order
-        text_words = text.split()
-        matched_words = set()
-        
-        for target_word in target_words:
-            if any(partial_word_match(target_word, text_word) for text_word in text_words):
-                matched_words.add(target_word)
-        
-        # Consider it a match if we've matched all target words
-        return len(matched_words) == len(target_words)
+        with self.metrics.span('match'):
+            matched = self.matcher.matches(scanned_text)
+        if matched:
+            self.click_and_settle('settle', self.config.close_button, 1.0)
+            self.count += 1
+            self.status.post(f"Found match for '{self.config.target_word}'. Count: {self.count}")
+        else:
+            self.reset_upgrade()
+            self.count = 0
 
+    def click_and_settle(self, action: str, button: Tuple[int, int], timeout: float) -> None:
+        # The old fixed sleep is the upper bound of the wait
+        reference = self.settle.sample(self.config.scan_region)
+        with self.metrics.span('click'):
+            self.input.click(*button, stop_event=self.stop_event)
+        with self.metrics.span('wait'):
+            self.timing.wait(action, self.config.scan_region, timeout, reference)
 
     def perform_upgrade_cycle(self) -> None:
         for _ in range(4):
-            click_button(*self.config.upgrade_button)
-            self.window.write_event_value('-UPDATE-', f"Clicked Upgrade button {_+1}/4")
-            time.sleep(0.3)
+            self.click_and_settle('upgrade', self.config.upgrade_button, 0.3)
+            self.status.post(f"Clicked Upgrade button {_+1}/4")
         
-        click_button(*self.config.skip_button)
-        self.window.write_event_value('-UPDATE-', "Clicked Skip button")
-        time.sleep(2)
+        self.click_and_settle('skip', self.config.skip_button, 2.0)
+        self.status.post("Clicked Skip button")
 
     def reset_upgrade(self) -> None:
-        click_button(*self.config.close_button)
-        time.sleep(0.3)
-        click_button(*self.config.reset_button)
-        time.sleep(0.3)
-        click_button(*self.config.confirm_button)
-        self.window.write_event_value('-UPDATE-', "Reset and confirmed")
+        self.click_and_settle('close', self.config.close_button, 0.3)
+        self.click_and_settle('reset', self.config.reset_button, 0.3)
+        self.click_and_settle('settle', self.config.confirm_button, 1.0)
+        self.status.post("Reset and confirmed")
 
     def stop(self) -> None:
         self.stop_event.set()
@@ -315,9 +285,11 @@ def create_main_window(config: Config) -> sg.Window:
         [sg.Button("Save Configuration", font=('Helvetica', 12)), 
          sg.Button("Start Process", font=('Helvetica', 12)), 
          sg.Button("Stop Process", font=('Helvetica', 12)), 
+         sg.Button("Export Stats", font=('Helvetica', 12)), 
          sg.Button("Exit", font=('Helvetica', 12))],
         [sg.Multiline(size=(70, 10), key='OUTPUT', disabled=True, 
-                     font=('Courier', 11))]
+                     font=('Courier', 11))],
+        [sg.Text("", key='STATS', font=('Courier', 9), size=(70, 11))]
     ]
     
     return sg.Window("Masterwork Helper", 
@@ -334,30 +306,26 @@ def validate_config(config: Config) -> bool:
         return False
     return True
 
-def init_tesseract():
+def init_tesseract(engine: EngineService):
     try:
-        # First try the bundled version
-        base_path = getattr(sys, '_MEIPASS', os.path.abspath('.'))
-        tesseract_path = os.path.join(base_path, 'Tesseract-OCR', 'tesseract.exe')
-        if os.path.exists(tesseract_path):
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path
-        else:
-            # Fall back to installed version
-            default_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-            if os.path.exists(default_path):
-                pytesseract.pytesseract.tesseract_cmd = default_path
-            else:
-                raise FileNotFoundError("Tesseract executable not found")
+        # Resolves the bundled or installed Tesseract and starts the OCR backend
+        engine.ocr.backend
     except Exception as e:
         sg.popup_error(f"Error initializing Tesseract: {str(e)}")
         sys.exit(1)
 
-init_tesseract()
-
-def main():
+def main(engine: Optional[EngineService] = None):
+    setup_logging('masterwork')
+    engine = engine or get_engine_service()
+    init_tesseract(engine)
     apply_theme()
     config = load_config()
     window = create_main_window(config)
+    console = OutputConsole(window['OUTPUT'])
+    status = StatusChannel(window)
+    kill_switch = KillSwitch(window)
+    metrics = None  # Stats of the latest run, kept after it stops
+    kill_switch.start()
 
     upgrade_process = None
 
@@ -384,7 +352,7 @@ def main():
                 if region:
                     window['SCAN_REGION'].update(','.join(map(str, region)))
                 else:
-                    window['OUTPUT'].print("Region selection cancelled or no region selected.")
+                    console.print("Region selection cancelled or no region selected.")
             else:
                 position = get_mouse_position(window, key)
                 window[key].update(f"{position[0]},{position[1]}")
@@ -398,39 +366,56 @@ def main():
                     confirm_button=tuple(map(int, values['CONFIRM'].split(','))),
                     scan_region=tuple(map(int, values['SCAN_REGION'].split(','))),
                     target_word=values['TARGET_WORD'],
-                    max_count=int(values['MAX_COUNT'])
+                    max_count=int(values['MAX_COUNT']),
+                    wait_for_settle=config.wait_for_settle,
+                    adaptive_timing=config.adaptive_timing,
+                    crop_text_lines=config.crop_text_lines,
+                    preprocess=config.preprocess,
+                    ocr_config=config.ocr_config,
+                    min_confidence=config.min_confidence,
+                    rescan_confidence=config.rescan_confidence
                 )
                 if validate_config(new_config):
                     save_config(new_config)
                     config = new_config
-                    window['OUTPUT'].print("Configuration saved successfully.")
+                    console.print("Configuration saved successfully.")
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
             except ValueError:
-                window['OUTPUT'].print("Invalid input. Please check all fields.")
+                console.print("Invalid input. Please check all fields.")
         elif event == "Start Process":
             if upgrade_process is None or not upgrade_process.is_alive():
                 if validate_config(config):
-                    upgrade_process = UpgradeProcess(config, window)
+                    upgrade_process = UpgradeProcess(config, status, engine=engine)
+                    kill_switch.arm(upgrade_process.stop_event)
+                    metrics = upgrade_process.metrics
                     upgrade_process.start()
                 else:
-                    window['OUTPUT'].print("Invalid configuration. Please check all fields.")
+                    console.print("Invalid configuration. Please check all fields.")
             else:
-                window['OUTPUT'].print("Process is already running.")
+                console.print("Process is already running.")
         elif event == "Stop Process":
             stop_upgrade_process(upgrade_process)
-            window['OUTPUT'].print("Process stopped.")
-        elif event == '-UPDATE-':
-            window['OUTPUT'].print(values['-UPDATE-'])
-        
-        # Check for 'P' key press to terminate the process
-        if keyboard.is_pressed('p') and upgrade_process and upgrade_process.is_alive():
-            stop_upgrade_process(upgrade_process)
-            window['OUTPUT'].print("Process terminated by user (P key pressed)")
-            upgrade_process = None
+            console.print("Process stopped.")
+        elif event == STATUS_EVENT:
+            console.write(status.drain())
+            if metrics is not None:
+                window['STATS'].update(format_stats(metrics.snapshot()))
+        elif event == "Export Stats":
+            path = metrics.export() if metrics is not None else None
+            console.print(f"Stats exported to {path}" if path else "No stats to export yet.")
+        elif event == KILL_EVENT:
+            # The hotkey hook already stopped the process, only wait for it to finish
+            if upgrade_process:
+                stop_upgrade_process(upgrade_process)
+                stopped_ms = (time.perf_counter() - kill_switch.pressed_at) * 1000
+                console.print(f"Process terminated by user (P key pressed), stopped in {stopped_ms:.0f} ms")
+                upgrade_process = None
 
     # Cleanup when closing window
     stop_upgrade_process(upgrade_process)
+    kill_switch.close()
+    status.close()
     window.close()
 
 if __name__ == "__main__":
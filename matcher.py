@@ -0,0 +1,120 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+def reference_flexible_match(target: str, text: str) -> bool:
+    """The original per-call matcher, kept as the behaviour TargetMatcher must reproduce."""
+    target = target.lower()
+    text = text.lower()
+
+    def normalize_spaces(s: str) -> str:
+        return re.sub(r'\s+', ' ', s).strip()
+
+    target = normalize_spaces(target)
+    text = normalize_spaces(text)
+
+    target_words = target.split()
+
+    def partial_word_match(word: str, text: str) -> bool:
+        if word in text:
+            return True
+
+        min_match_length = max(3, len(word) // 2)
+        for i in range(len(text) - min_match_length + 1):
+            if text[i:i+min_match_length] in word:
+                return True
+        return False
+
+    text_words = text.split()
+    matched_words = set()
+
+    for target_word in target_words:
+        if any(partial_word_match(target_word, text_word) for text_word in text_words):
+            matched_words.add(target_word)
+
+    return len(matched_words) == len(target_words)
+
+
+class TargetMatcher:
+    """All target phrases compiled into one n-gram index.
+
+    A target word of length n matches an OCR word when it is a substring of
+    it, or when the two share any substring of length max(3, n // 2). Words
+    of 3+ characters are covered by the n-gram lookup alone; shorter ones
+    need the substring check.
+    """
+
+    def __init__(self, targets: Sequence[str], memo_size: int = 256):
+        self.targets = list(targets)
+        self.memo_size = memo_size
+        self.memo: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        word_ids: Dict[str, int] = {}
+        self.target_word_ids: List[Optional[Set[int]]] = []
+        for target in self.targets:
+            words = target.lower().split()
+            ids = {word_ids.setdefault(word, len(word_ids)) for word in words}
+            # The original compared a set of matched words against the word
+            # list, so a phrase repeating a word could never match
+            self.target_word_ids.append(ids if len(ids) == len(words) else None)
+
+        self.gram_index: Dict[int, Dict[str, Set[int]]] = {}
+        self.short_words: List[Tuple[str, int]] = []
+        for word, word_id in word_ids.items():
+            if len(word) < 3:
+                self.short_words.append((word, word_id))
+                continue
+            length = max(3, len(word) // 2)
+            grams = self.gram_index.setdefault(length, {})
+            for i in range(len(word) - length + 1):
+                grams.setdefault(word[i:i + length], set()).add(word_id)
+
+    def _matched_word_ids(self, text_words: Set[str]) -> Set[int]:
+        matched = set()
+        for text_word in text_words:
+            for length, grams in self.gram_index.items():
+                for i in range(len(text_word) - length + 1):
+                    ids = grams.get(text_word[i:i + length])
+                    if ids:
+                        matched |= ids
+            for word, word_id in self.short_words:
+                if word in text_word:
+                    matched.add(word_id)
+        return matched
+
+    def matches(self, text: str) -> Tuple[int, ...]:
+        """Indices of every target that matches text, in target order."""
+        with self.lock:
+            result = self.memo.get(text)
+            if result is not None:
+                self.memo.move_to_end(text)
+                return result
+        matched = self._matched_word_ids(set(text.lower().split()))
+        result = tuple(i for i, ids in enumerate(self.target_word_ids)
+                       if ids is not None and ids <= matched)
+        with self.lock:
+            self.memo[text] = result
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return result
+
+    def first_match(self, text: str) -> Optional[str]:
+        result = self.matches(text)
+        return self.targets[result[0]] if result else None
+
+
+@lru_cache(maxsize=32)
+def _compile(targets: Tuple[str, ...]) -> TargetMatcher:
+    return TargetMatcher(targets)
+
+
+def compile_targets(targets: Sequence[str]) -> TargetMatcher:
+    return _compile(tuple(targets))
+
+
+def flexible_match(target: str, text: str) -> bool:
+    return bool(compile_targets([target]).matches(text))
@@ -0,0 +1,85 @@
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def image_key(image: np.ndarray, config: str = '') -> str:
+    """Content hash of an image buffer plus the OCR settings used to read it."""
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.shape}|{image.dtype}|{config}".encode())
+    digest.update(memoryview(image).cast('B'))
+    return digest.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, max_entries: int = 512, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()  # Text, or the words of a word result
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            text = self.entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: Any) -> None:
+        with self.lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def load(self) -> None:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r') as f:
+                entries = json.load(f)
+            with self.lock:
+                for key, text in entries[-self.max_entries:]:
+                    self.entries[key] = text
+        except Exception as e:
+            logging.error(f"Error loading OCR cache: {e}")
+
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+        try:
+            with self.lock:
+                entries = list(self.entries.items())
+            with open(self.persist_path, 'w') as f:
+                json.dump(entries, f)
+        except Exception as e:
+            logging.error(f"Error saving OCR cache: {e}")
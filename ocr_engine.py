@@ -0,0 +1,452 @@
+import numpy as np
+import json
+import logging
+import os
+import shlex
+import shutil
+import sys
+import queue
+import threading
+import atexit
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, field
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+from ocr_cache import OcrCache, image_key
+from lazy_loading import lazy_import
+
+# Only the subprocess backend needs it
+pytesseract = lazy_import('pytesseract')
+
+DEFAULT_TESSERACT_DIR = r'C:\Program Files\Tesseract-OCR'
+OCR_CACHE_FILE = 'ocr_cache.json'
+OCR_CACHE_CONFIG_FILE = 'ocr_cache_config.json'
+
+TILE_SEPARATOR = 20  # Blank rows between stacked images
+SINGLE_LINE_PSMS = {7, 8, 10, 13}  # Page segmentation modes that read one line, word or char
+TILE_PADDING = 10
+WORDS_KEY = '|words'  # Cache keys of word results differ from those of plain text
+
+
+@dataclass
+class OcrWord:
+    text: str
+    box: Tuple[int, int, int, int]  # left, top, width, height
+    conf: float
+    line: int  # Words sharing this id were read as one text line
+
+
+def words_to_text(words: Sequence[OcrWord]) -> str:
+    lines: Dict[int, List[str]] = {}
+    for word in words:
+        lines.setdefault(word.line, []).append(word.text)
+    return '\n'.join(' '.join(line) for line in lines.values())
+
+
+@dataclass
+class OcrResult:
+    """Text of one image and the words it was read from; no words when the backend only returns text."""
+    text: str
+    words: List[OcrWord] = field(default_factory=list)
+
+    @classmethod
+    def from_words(cls, words: Sequence[OcrWord]) -> 'OcrResult':
+        return cls(words_to_text(words).strip(), list(words))
+
+    @property
+    def confidence(self) -> Optional[float]:
+        """Confidence (0-100) of the least certain word, None when there is nothing to judge."""
+        return min(word.conf for word in self.words) if self.words else None
+
+    def trusted_text(self, min_conf: float = 0.0) -> str:
+        """The text without the words read below min_conf."""
+        if min_conf <= 0 or not self.words:
+            return self.text
+        return words_to_text([word for word in self.words if word.conf >= min_conf]).strip()
+
+    def to_cache(self) -> list:
+        return [[word.text, list(word.box), word.conf, word.line] for word in self.words]
+
+    @classmethod
+    def from_cache(cls, entry: list) -> 'OcrResult':
+        return cls.from_words([OcrWord(text, tuple(box), conf, line) for text, box, conf, line in entry])
+
+
+def find_tesseract_cmd() -> str:
+    # First try the bundled version, then the installed one, then whatever is on PATH
+    base_path = getattr(sys, '_MEIPASS', os.path.abspath('.'))
+    for directory in (os.path.join(base_path, 'Tesseract-OCR'), DEFAULT_TESSERACT_DIR):
+        tesseract_cmd = os.path.join(directory, 'tesseract.exe')
+        if os.path.exists(tesseract_cmd):
+            return tesseract_cmd
+    tesseract_cmd = shutil.which('tesseract')
+    if tesseract_cmd:
+        return tesseract_cmd
+    raise FileNotFoundError("Tesseract executable not found")
+
+
+def parse_tesseract_config(config: str) -> Tuple[str, Optional[int], Optional[int], Dict[str, str]]:
+    """Split a pytesseract style config string into (lang, psm, oem, variables)."""
+    lang, psm, oem = 'eng', None, None
+    variables = {}
+    args = shlex.split(config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else ''
+        if arg == '--psm':
+            psm = int(value)
+            i += 1
+        elif arg == '--oem':
+            oem = int(value)
+            i += 1
+        elif arg == '-l':
+            lang = value
+            i += 1
+        elif arg == '-c' and '=' in value:
+            key, var_value = value.split('=', 1)
+            variables[key] = var_value
+            i += 1
+        i += 1
+    return lang, psm, oem, variables
+
+
+class OcrBackend:
+    name = 'base'
+    supports_data = False
+
+    def image_to_string(self, image: np.ndarray, config: str = '') -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: np.ndarray, config: str = '') -> List[OcrWord]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SubprocessBackend(OcrBackend):
+    """pytesseract: starts tesseract.exe for every call."""
+    name = 'subprocess'
+    supports_data = True
+
+    def __init__(self, tesseract_cmd: Optional[str] = None):
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    def image_to_string(self, image: np.ndarray, config: str = '') -> str:
+        return pytesseract.image_to_string(image, config=config)
+
+    def image_to_data(self, image: np.ndarray, config: str = '') -> List[OcrWord]:
+        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+        words = []
+        line_ids = {}
+        for i, text in enumerate(data['text']):
+            if not text.strip():
+                continue
+            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            line = line_ids.setdefault(line_key, len(line_ids))
+            box = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
+            words.append(OcrWord(text, box, float(data['conf'][i]), line))
+        return words
+
+
+class TesserocrBackend(OcrBackend):
+    """Keeps initialised Tesseract API instances alive and feeds them raw buffers."""
+    name = 'tesserocr'
+    supports_data = True
+
+    def __init__(self, tesseract_cmd: str, max_instances: int = 4):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        tessdata_path = os.path.join(os.path.dirname(tesseract_cmd), 'tessdata')
+        # Without a bundled tessdata folder tesserocr uses its compiled-in default
+        self.tessdata_path = tessdata_path if os.path.isdir(tessdata_path) else None
+        self.max_instances = max_instances
+        self.pools: Dict[str, queue.Queue] = {}
+        self.created: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def _create_api(self, config: str):
+        lang, psm, oem, variables = parse_tesseract_config(config)
+        kwargs = {'lang': lang}
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        if psm is not None:
+            kwargs['psm'] = psm
+        if oem is not None:
+            kwargs['oem'] = oem
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            api.SetVariable(key, value)
+        return api
+
+    def _acquire(self, config: str):
+        with self.lock:
+            pool = self.pools.setdefault(config, queue.Queue())
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                pass
+            if self.created.get(config, 0) < self.max_instances:
+                self.created[config] = self.created.get(config, 0) + 1
+                return self._create_api(config)
+        return pool.get()
+
+    def _release(self, config: str, api) -> None:
+        self.pools[config].put(api)
+
+    def _set_image(self, api, image: np.ndarray) -> None:
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+
+    def image_to_string(self, image: np.ndarray, config: str = '') -> str:
+        api = self._acquire(config)
+        try:
+            self._set_image(api, image)
+            return api.GetUTF8Text()
+        finally:
+            self._release(config, api)
+
+    def image_to_data(self, image: np.ndarray, config: str = '') -> List[OcrWord]:
+        api = self._acquire(config)
+        words = []
+        try:
+            self._set_image(api, image)
+            api.Recognize()
+            iterator = api.GetIterator()
+            line = -1
+            level = tesserocr.RIL.WORD
+            while iterator is not None:
+                if iterator.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+                text = iterator.GetUTF8Text(level)
+                bounds = iterator.BoundingBox(level)
+                if text and text.strip() and bounds:
+                    left, top, right, bottom = bounds
+                    words.append(OcrWord(text, (left, top, right - left, bottom - top),
+                                         iterator.Confidence(level), max(line, 0)))
+                if not iterator.Next(level):
+                    break
+            return words
+        finally:
+            self._release(config, api)
+
+    def close(self) -> None:
+        with self.lock:
+            for pool in self.pools.values():
+                while not pool.empty():
+                    pool.get_nowait().End()
+            self.pools.clear()
+            self.created.clear()
+
+
+class FakeBackend(OcrBackend):
+    """Returns scripted text, for running the tools without Tesseract."""
+    name = 'fake'
+
+    def __init__(self, responder: Union[str, Callable[[np.ndarray, str], str]] = ''):
+        self.responder = responder
+        self.calls = 0
+
+    def image_to_string(self, image: np.ndarray, config: str = '') -> str:
+        self.calls += 1
+        if callable(self.responder):
+            return self.responder(image, config)
+        return self.responder
+
+
+def create_backend(name: str = 'auto') -> OcrBackend:
+    if name == 'fake':
+        return FakeBackend()
+    tesseract_cmd = find_tesseract_cmd()
+    if name == 'tesserocr' or (name == 'auto' and tesserocr is not None):
+        try:
+            return TesserocrBackend(tesseract_cmd)
+        except Exception as e:
+            logging.error(f"In-process OCR unavailable, falling back to subprocess: {e}")
+    return SubprocessBackend(tesseract_cmd)
+
+
+def tile_images(images: Sequence[np.ndarray]) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """Stack binarised images into one dark-on-light canvas, returning the row span of each."""
+    width = max(image.shape[1] for image in images) + 2 * TILE_PADDING
+    height = sum(image.shape[0] for image in images) + TILE_SEPARATOR * (len(images) + 1)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    spans = []
+    y = TILE_SEPARATOR
+    for image in images:
+        h, w = image.shape[:2]
+        tile = canvas[y:y + h, TILE_PADDING:TILE_PADDING + w]
+        # Light text on a dark background would merge with the canvas, flip it
+        if np.count_nonzero(image) < image.size // 2:
+            np.subtract(255, image, out=tile)
+        else:
+            tile[:] = image
+        spans.append((y, y + h))
+        y += h + TILE_SEPARATOR
+    return canvas, spans
+
+
+def group_words_by_tile(words: Sequence[OcrWord], spans: Sequence[Tuple[int, int]]) -> List[List[OcrWord]]:
+    """Words of a tiled canvas per tile, with boxes relative to their tile."""
+    groups: List[List[OcrWord]] = [[] for _ in spans]
+    for word in words:
+        left, top, width, height = word.box
+        center = top + height // 2
+        for tile_index, (tile_top, tile_bottom) in enumerate(spans):
+            if tile_top - TILE_SEPARATOR // 2 <= center < tile_bottom + TILE_SEPARATOR // 2:
+                groups[tile_index].append(OcrWord(word.text, (left - TILE_PADDING, top - tile_top, width, height),
+                                                  word.conf, word.line))
+                break
+    return groups
+
+
+def split_words_by_tile(words: Sequence[OcrWord], spans: Sequence[Tuple[int, int]]) -> List[str]:
+    return [words_to_text(group) for group in group_words_by_tile(words, spans)]
+
+
+class OcrEngine:
+    def __init__(self, backend: Optional[OcrBackend] = None, cache: Optional[OcrCache] = None):
+        self._backend = backend
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.backend_calls = 0  # Images recognised by the backend, cache hits not included
+
+    @property
+    def backend(self) -> OcrBackend:
+        if self._backend is None:
+            with self.lock:
+                if self._backend is None:
+                    self._backend = create_backend()
+        return self._backend
+
+    def set_backend(self, backend: OcrBackend) -> None:
+        with self.lock:
+            if self._backend is not None:
+                self._backend.close()
+            self._backend = backend
+        if self.cache is not None:
+            self.cache.clear()
+
+    def count_backend_calls(self, calls: int) -> None:
+        with self.lock:
+            self.backend_calls += calls
+
+    def image_to_string(self, image: np.ndarray, config: str = '') -> str:
+        if self.cache is None:
+            self.count_backend_calls(1)
+            return self.backend.image_to_string(image, config)
+        key = image_key(image, config)
+        text = self.cache.get(key)
+        if text is None:
+            self.count_backend_calls(1)
+            text = self.backend.image_to_string(image, config)
+            self.cache.put(key, text)
+        return text
+
+    def image_to_data(self, image: np.ndarray, config: str = '') -> List[OcrWord]:
+        return self.backend.image_to_data(image, config)
+
+    def image_to_result(self, image: np.ndarray, config: str = '') -> OcrResult:
+        """Words with confidences and boxes; text only from backends that cannot report them."""
+        backend = self.backend
+        if not backend.supports_data:
+            return OcrResult(self.image_to_string(image, config).strip())
+        key = image_key(image, config + WORDS_KEY) if self.cache is not None else None
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None:
+            return OcrResult.from_cache(entry)
+        self.count_backend_calls(1)
+        result = OcrResult.from_words(backend.image_to_data(image, config))
+        if key is not None:
+            self.cache.put(key, result.to_cache())
+        return result
+
+    def image_to_results(self, images: Sequence[np.ndarray], config: str = '') -> List[OcrResult]:
+        """image_to_result for several single-channel images, tiled into one pass like image_to_strings."""
+        backend = self.backend
+        if not backend.supports_data:
+            return [OcrResult(text.strip()) for text in self.image_to_strings(images, config)]
+        results: List[Optional[OcrResult]] = [None] * len(images)
+        keys = []
+        if self.cache is not None:
+            keys = [image_key(image, config + WORDS_KEY) for image in images]
+            for i, key in enumerate(keys):
+                entry = self.cache.get(key)
+                if entry is not None:
+                    results[i] = OcrResult.from_cache(entry)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        self.count_backend_calls(len(missing))
+        if len(missing) < 2 or parse_tesseract_config(config)[1] in SINGLE_LINE_PSMS:
+            groups = [backend.image_to_data(images[i], config) for i in missing]
+        else:
+            canvas, spans = tile_images([images[i] for i in missing])
+            groups = group_words_by_tile(backend.image_to_data(canvas, config), spans)
+        for i, words in zip(missing, groups):
+            results[i] = OcrResult.from_words(words)
+            if self.cache is not None:
+                self.cache.put(keys[i], results[i].to_cache())
+        return results
+
+    def image_to_strings(self, images: Sequence[np.ndarray], config: str = '') -> List[str]:
+        """OCR several single-channel images with one pass over a tiled canvas."""
+        texts: List[Optional[str]] = [None] * len(images)
+        keys = []
+        if self.cache is not None:
+            keys = [image_key(image, config) for image in images]
+            texts = [self.cache.get(key) for key in keys]
+        # Only images the cache has not seen go to Tesseract
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if not missing:
+            return texts
+        backend = self.backend
+        self.count_backend_calls(len(missing))
+        # A stacked canvas has several lines, single line modes must see each image alone
+        if len(missing) < 2 or not backend.supports_data or \
+                parse_tesseract_config(config)[1] in SINGLE_LINE_PSMS:
+            results = [backend.image_to_string(images[i], config) for i in missing]
+        else:
+            canvas, spans = tile_images([images[i] for i in missing])
+            results = split_words_by_tile(backend.image_to_data(canvas, config), spans)
+        for i, text in zip(missing, results):
+            texts[i] = text
+            if self.cache is not None:
+                self.cache.put(keys[i], text)
+        return texts
+
+
+def load_cache_config() -> dict:
+    """Settings of the shared OCR cache: 'persist' keeps it on disk between runs, off unless set."""
+    try:
+        with open(OCR_CACHE_CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"Error loading {OCR_CACHE_CONFIG_FILE}: {e}")
+    return {}
+
+
+def create_default_cache() -> OcrCache:
+    config = load_cache_config()
+    if not config.get('persist', False):
+        return OcrCache()
+    cache = OcrCache(persist_path=config.get('path', OCR_CACHE_FILE))
+    atexit.register(cache.save)
+    return cache
+
+
+_default_engine = OcrEngine(cache=create_default_cache())
+
+
+def get_ocr_engine() -> OcrEngine:
+    return _default_engine
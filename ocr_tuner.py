@@ -0,0 +1,181 @@
+import argparse
+import difflib
+import itertools
+import shlex
+import string
+import sys
+import time
+from typing import List, Optional, Sequence
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+# replay goes first, it stands in for the desktop-only modules the others import
+from replay import FIXTURES_DIR, Fixture, LabelResponder, configure_ocr, import_tool, text_fixtures
+from frame_source import Frame
+from matcher import compile_targets
+from ocr_engine import get_ocr_engine
+from preprocess import PreprocessConfig, PreprocessPipeline
+from text_roi import TextRoiCache
+from text_scan import scan_for_text
+
+TOOLS = ['barter', 'enchant', 'masterwork']
+PSMS = [None, 6, 7]  # Tesseract default (3, full page), uniform block, single line
+OEMS = [None, 1]  # Model default, LSTM only
+WHITELIST_BASE = string.ascii_letters + string.digits + '+-%.,:()'
+SIMILARITY_TOLERANCE = 0.02  # Text similarity given up for speed among equally accurate settings
+
+
+@dataclass
+class Trial:
+    ocr_config: str
+    preprocess: PreprocessConfig
+    accuracy: float  # Share of regions where the target word decision matches the label
+    similarity: float  # Mean character similarity of OCR text and label
+    latency_ms: float  # Mean preprocessing plus OCR time per region
+
+    def describe(self) -> str:
+        return f"{self.ocr_config or '(default)'} {self.preprocess.to_dict()}"
+
+
+def whitelist_for(fixture: Fixture, targets: Sequence[str]) -> str:
+    # Fixtures never show every item, so the base set keeps unseen names readable
+    characters = set(WHITELIST_BASE + ''.join(text for texts in fixture.labels for text in texts) + ''.join(targets))
+    characters.discard(' ')
+    return ''.join(sorted(characters))
+
+
+def ocr_configs(whitelist: str) -> List[str]:
+    configs = []
+    for psm, oem, restrict in itertools.product(PSMS, OEMS, [False, True]):
+        args = []
+        if psm is not None:
+            args += ['--psm', str(psm)]
+        if oem is not None:
+            args += ['--oem', str(oem)]
+        if restrict:
+            args += ['-c', f"tessedit_char_whitelist={whitelist}"]
+        configs.append(' '.join(shlex.quote(arg) for arg in args))
+    return configs
+
+
+def preprocess_configs(denoise: bool) -> List[PreprocessConfig]:
+    return [PreprocessConfig(upscale, noise, invert)
+            for upscale, noise, invert in itertools.product([1.0, 2.0], [False, True] if denoise else [False],
+                                                            [False, True])]
+
+
+def fixture_frames(fixture: Fixture) -> List[Frame]:
+    return [Frame(image, fixture.origin, 0.0) for image in fixture.frames]
+
+
+def run_trial(fixture: Fixture, frames: List[Frame], targets: Sequence[str], ocr_config: str,
+              preprocess: PreprocessConfig, crop_text_lines: bool) -> Trial:
+    matcher = compile_targets(targets)
+    pipeline = PreprocessPipeline(preprocess)
+    roi = TextRoiCache() if crop_text_lines else None
+    correct = 0
+    similarity = 0.0
+    count = 0
+    elapsed = 0.0
+    for frame, labels in zip(frames, fixture.labels):
+        for region, label in zip(fixture.regions, labels):
+            start = time.perf_counter()
+            text = scan_for_text(region, frame, roi=roi, pipeline=pipeline, ocr_config=ocr_config)
+            elapsed += time.perf_counter() - start
+            correct += matcher.matches(text) == matcher.matches(label)
+            similarity += difflib.SequenceMatcher(None, label.lower(), text.lower()).ratio()
+            count += 1
+    return Trial(ocr_config, preprocess, correct / count, similarity / count, elapsed / count * 1000)
+
+
+def pareto_front(trials: Sequence[Trial]) -> List[Trial]:
+    """Trials no other trial beats on accuracy, similarity and latency at once."""
+    def dominates(a: Trial, b: Trial) -> bool:
+        no_worse = a.accuracy >= b.accuracy and a.similarity >= b.similarity and a.latency_ms <= b.latency_ms
+        better = a.accuracy > b.accuracy or a.similarity > b.similarity or a.latency_ms < b.latency_ms
+        return no_worse and better
+    return [trial for trial in trials if not any(dominates(other, trial) for other in trials)]
+
+
+def choose(front: Sequence[Trial]) -> Trial:
+    """The fastest of the most accurate settings on the front."""
+    best_accuracy = max(trial.accuracy for trial in front)
+    accurate = [trial for trial in front if trial.accuracy >= best_accuracy]
+    best_similarity = max(trial.similarity for trial in accurate)
+    close = [trial for trial in accurate if trial.similarity >= best_similarity - SIMILARITY_TOLERANCE]
+    return min(close, key=lambda trial: trial.latency_ms)
+
+
+def tool_targets(config) -> List[str]:
+    if hasattr(config, 'target_words'):
+        return [word.strip() for word in config.target_words if word.strip()]
+    return [config.target_word]
+
+
+def write_tool_config(tool, config, trial: Trial) -> None:
+    # Only the tuned fields change, the rest of the tool's settings are kept
+    tool.save_config(replace(config, ocr_config=trial.ocr_config, preprocess=trial.preprocess.to_dict()))
+
+
+def tune_tool(name: str, fixture: Fixture, args, responder: LabelResponder) -> Optional[Trial]:
+    tool = import_tool(name)
+    config = tool.load_config()
+    targets = tool_targets(config)
+    frames = fixture_frames(fixture)
+    candidates = list(itertools.product(ocr_configs(whitelist_for(fixture, targets)),
+                                        preprocess_configs(args.denoise)))
+    if args.backend_name == 'fake':
+        # Labels stand in for OCR, registered for every preprocessing variant
+        for preprocess in preprocess_configs(args.denoise):
+            pipeline = PreprocessPipeline(preprocess)
+            for frame, labels in zip(frames, fixture.labels):
+                for region, label in zip(fixture.regions, labels):
+                    responder.add(pipeline.process(frame.region(region), frame.channels).copy(), label)
+
+    print(f"{name}: {len(candidates)} settings over {len(frames)} frames x {len(fixture.regions)} regions")
+    if not fixture.recorded:
+        print(f"  Synthetic fixtures; `benchmark.py record {name}` captures the game font for settings that fit it")
+    trials = [run_trial(fixture, frames, targets, ocr_config, preprocess, config.crop_text_lines)
+              for ocr_config, preprocess in candidates]
+    front = sorted(pareto_front(trials), key=lambda trial: trial.latency_ms)
+    for trial in front:
+        print(f"  accuracy {trial.accuracy:6.1%}  similarity {trial.similarity:5.3f}  "
+              f"{trial.latency_ms:8.2f} ms  {trial.describe()}")
+    default = trials[0]
+    best = choose(front)
+    print(f"  chosen: {best.describe()}")
+    print(f"  vs default: accuracy {default.accuracy:.1%} -> {best.accuracy:.1%}, "
+          f"{default.latency_ms:.2f} ms -> {best.latency_ms:.2f} ms per region")
+    if args.write:
+        write_tool_config(tool, config, best)
+        print(f"  written to {tool.CONFIG_FILE}")
+    return best
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pick the fastest accurate Tesseract settings per tool")
+    parser.add_argument('--tool', action='append', choices=TOOLS, help="Tool to tune, all by default")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR,
+                        help="Recorded fixtures from `benchmark.py record`; synthetic strips otherwise")
+    parser.add_argument('--frames', type=int, default=6, help="Synthetic frames per tool")
+    parser.add_argument('--ocr', default='auto', choices=['auto', 'subprocess', 'tesserocr', 'fake'])
+    parser.add_argument('--denoise', action='store_true', help="Also try the median filter")
+    parser.add_argument('--write', action='store_true', help="Save the chosen settings to each tool's config")
+    parser.add_argument('--seed', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    responder = LabelResponder()
+    args.backend_name = configure_ocr(args.ocr, responder)
+    # Every setting is timed on real recognition, never on a cache hit
+    get_ocr_engine().cache = None
+    fixtures = text_fixtures(args.fixtures, args.frames, np.random.default_rng(args.seed))
+    for name in args.tool or TOOLS:
+        tune_tool(name, fixtures[name], args, responder)
+    if not args.write:
+        print("Dry run, pass --write to save the chosen settings")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
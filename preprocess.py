@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, asdict, fields
+
+_GRAY_CODES = {'BGR': cv2.COLOR_BGR2GRAY, 'RGB': cv2.COLOR_RGB2GRAY,
+               'BGRA': cv2.COLOR_BGRA2GRAY, 'RGBA': cv2.COLOR_RGBA2GRAY}
+
+
+@dataclass
+class PreprocessConfig:
+    upscale: float = 1.0  # Resize factor before thresholding, Tesseract prefers ~30 px glyphs
+    denoise: bool = False  # 3x3 median filter against compression and dithering noise
+    invert: bool = False  # Dark text on light background after thresholding
+
+    @classmethod
+    def from_dict(cls, values: Optional[dict]) -> 'PreprocessConfig':
+        names = {field.name for field in fields(cls)}
+        return cls(**{k: v for k, v in (values or {}).items() if k in names})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def variant(self) -> 'PreprocessConfig':
+        """The second try for text read with low confidence: the other scale and denoise setting."""
+        return PreprocessConfig(upscale=1.0 if self.upscale >= 2 else 2.0, denoise=not self.denoise,
+                                invert=self.invert)
+
+
+class PreprocessPipeline:
+    """Turns captured region pixels into binary OCR input, reusing buffers between cycles.
+
+    Every stage writes into a buffer kept per caller key (normally the scan
+    region) and image shape, so a steady scan loop allocates nothing after its
+    first cycle. A returned image is only valid until the next call with the
+    same key. Regions of one cycle use different keys and can be processed
+    concurrently.
+    """
+
+    def __init__(self, config: Optional[PreprocessConfig] = None):
+        self.config = config or PreprocessConfig()
+        self.buffers: Dict[Tuple[Hashable, str], np.ndarray] = {}
+        self.lock = threading.Lock()
+        self.allocations = 0
+        self.calls = 0
+        self.stage_seconds: Dict[str, float] = {}
+
+    def buffer(self, key: Hashable, stage: str, shape: Tuple[int, ...]) -> np.ndarray:
+        with self.lock:
+            buffer = self.buffers.get((key, stage))
+            if buffer is None or buffer.shape != shape:
+                buffer = np.empty(shape, dtype=np.uint8)
+                self.buffers[(key, stage)] = buffer
+                self.allocations += 1
+            return buffer
+
+    def record(self, stage: str, start: float) -> float:
+        now = time.perf_counter()
+        with self.lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + now - start
+        return now
+
+    def process(self, image: np.ndarray, channels: str = 'BGR', key: Hashable = None) -> np.ndarray:
+        config = self.config
+        start = time.perf_counter()
+        height, width = image.shape[:2]
+        if image.ndim == 3:
+            # Straight from the capture format, no intermediate colour conversion
+            gray = cv2.cvtColor(image, _GRAY_CODES[channels], dst=self.buffer(key, 'gray', (height, width)))
+        else:
+            gray = image
+        start = self.record('gray', start)
+
+        if config.upscale != 1.0:
+            size = (max(1, round(width * config.upscale)), max(1, round(height * config.upscale)))
+            gray = cv2.resize(gray, size, dst=self.buffer(key, 'upscale', (size[1], size[0])),
+                              interpolation=cv2.INTER_CUBIC)
+            start = self.record('upscale', start)
+
+        if config.denoise:
+            gray = cv2.medianBlur(gray, 3, dst=self.buffer(key, 'denoise', gray.shape))
+            start = self.record('denoise', start)
+
+        # Inverting is folded into the threshold type, it costs nothing extra
+        mode = cv2.THRESH_BINARY_INV if config.invert else cv2.THRESH_BINARY
+        binary = cv2.threshold(gray, 0, 255, mode | cv2.THRESH_OTSU,
+                               dst=self.buffer(key, 'binary', gray.shape))[1]
+        self.record('threshold', start)
+        with self.lock:
+            self.calls += 1
+        return binary
+
+    def process_batch(self, images: Sequence[Optional[np.ndarray]], channels: str = 'BGR',
+                      keys: Optional[Sequence[Hashable]] = None) -> List[Optional[np.ndarray]]:
+        """All regions of a cycle in one call; None entries stay None."""
+        keys = keys if keys is not None else range(len(images))
+        return [self.process(image, channels, key) if image is not None else None
+                for image, key in zip(images, keys)]
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            stats = {'calls': self.calls, 'allocations': self.allocations}
+            for stage, seconds in self.stage_seconds.items():
+                stats[f"{stage}_ms"] = seconds * 1000
+            return stats
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.calls = 0
+            self.allocations = 0
+            self.stage_seconds.clear()
+
+
+_default_pipeline = PreprocessPipeline()
+
+
+def get_preprocess_pipeline() -> PreprocessPipeline:
+    return _default_pipeline
+
+
+def preprocess_image(image: np.ndarray, channels: str = 'BGR') -> np.ndarray:
+    """Grayscale plus Otsu threshold with the default settings, into a fresh array."""
+    return _default_pipeline.process(image, channels, key=threading.get_ident()).copy()
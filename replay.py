@@ -0,0 +1,197 @@
+import cv2
+import numpy as np
+import glob
+import importlib
+import json
+import os
+import threading
+import time
+import types
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+
+from desktop_placeholders import install_desktop_placeholders
+
+# Project modules import the desktop modules at load time, so the placeholders go in first
+install_desktop_placeholders()
+
+from frame_source import Frame, FrameSource, Region, union_region
+from ocr_cache import OcrCache, image_key
+from ocr_engine import FakeBackend, create_backend, get_ocr_engine
+from screen_settle import SettleDetector
+
+
+class ReplayFrameSource(FrameSource):
+    """Serves recorded frames instead of grabbing the screen, one per grab."""
+
+    def __init__(self, frames: Sequence[np.ndarray], origin: Tuple[int, int]):
+        super().__init__()
+        self.frames = list(frames)
+        self.origin = origin
+        self.index = 0
+
+    @classmethod
+    def from_directory(cls, path: str, origin: Tuple[int, int]) -> 'ReplayFrameSource':
+        frames = [cv2.imread(file) for file in sorted(glob.glob(os.path.join(path, '*.png')))]
+        return cls([frame for frame in frames if frame is not None], origin)
+
+    def grab(self, regions: Sequence[Region]) -> Optional[Frame]:
+        if not self.frames:
+            return None
+        image = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return Frame(image, self.origin, time.perf_counter())
+
+
+class StatusRecorder:
+    """Stands in for the status channel; keeps every status message a process posts."""
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    def post(self, message: object) -> None:
+        self.messages.append(str(message))
+
+
+class InstantSettle(SettleDetector):
+    """A game UI that has always finished redrawing by the time it is checked."""
+
+    def __init__(self, stop_event: Optional[threading.Event] = None):
+        super().__init__(frame_source=FrameSource(), enabled=False, stop_event=stop_event)
+
+    def sample(self, region: Region) -> Optional[np.ndarray]:
+        return None
+
+    def sleep(self, timeout: float) -> bool:
+        # Replayed frames do not change with time, waiting for the next loop would only add the delay
+        return not self.stop_event.is_set()
+
+    def wait_for_update(self, region: Region, timeout: float,
+                        reference: Optional[np.ndarray] = None) -> bool:
+        return True
+
+    def wait_until_changed(self, region: Region, timeout: float,
+                           reference: Optional[np.ndarray] = None) -> bool:
+        return True
+
+
+def import_tool(name: str) -> types.ModuleType:
+    """Import a tool module for replay on a machine without a display or Windows APIs."""
+    install_desktop_placeholders()
+    return importlib.import_module(name)
+
+
+FIXTURES_DIR = 'fixtures'
+
+# Layouts of the shipped configuration files, so results compare across machines
+BARTER_REGIONS = [(333, 80, 260, 88), (338, 173, 245, 94), (339, 274, 289, 58), (340, 372, 249, 58),
+                  (336, 464, 281, 60), (336, 559, 283, 56), (337, 653, 302, 59), (334, 751, 278, 58)]
+ENCHANT_REGIONS = [(120, 300, 420, 40), (120, 360, 420, 40)]
+MASTERWORK_REGION = (120, 685, 472, 46)
+VENDOR_ITEMS = ["Boss Summoning Material", "Salvage Rune", "Sold Out", "Legendary Gloves",
+                "Ancestral Amulet", "Unique Ring", "Rare Boots", "Obducite x20", "Veiled Crystal"]
+AFFIXES = ["+12.5% Critical Strike Chance", "+184 Maximum Life", "+46 Dexterity",
+           "+9.0% Attack Speed", "+22% Vulnerable Damage", "+31 All Stats"]
+
+
+@dataclass
+class Fixture:
+    frames: List[np.ndarray]
+    origin: Tuple[int, int]
+    regions: List[Tuple[int, int, int, int]]
+    labels: List[List[str]]  # Expected text of every region, per frame
+    recorded: bool = False  # Captured from the game rather than drawn with OpenCV fonts
+
+
+def draw_text_frame(regions: Sequence[Tuple[int, int, int, int]], texts: Sequence[str]) -> np.ndarray:
+    bbox = union_region(regions)
+    frame = np.full((bbox[3], bbox[2], 3), (20, 22, 26), dtype=np.uint8)
+    for (x, y, w, h), text in zip(regions, texts):
+        scale = min(h / 45.0, w / (len(text) * 20.0 + 1))
+        cv2.putText(frame, text, (x - bbox[0] + 6, y - bbox[1] + h // 2 + int(10 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, scale, (215, 210, 200), 1, cv2.LINE_AA)
+    return frame
+
+
+def synthesize_text_fixture(regions: Sequence[Tuple[int, int, int, int]], vocabulary: Sequence[str],
+                            count: int, rng: np.random.Generator) -> Fixture:
+    labels = [[vocabulary[i] for i in rng.integers(0, len(vocabulary), len(regions))] for _ in range(count)]
+    frames = [draw_text_frame(regions, texts) for texts in labels]
+    bbox = union_region(regions)
+    return Fixture(frames, (bbox[0], bbox[1]), list(regions), labels)
+
+
+def load_recorded_fixture(tool: str, fixtures_dir: str) -> Optional[Fixture]:
+    """Frames saved by `benchmark.py record`: PNGs plus labels.json with regions and texts."""
+    labels_file = os.path.join(fixtures_dir, tool, 'labels.json')
+    if not os.path.exists(labels_file):
+        return None
+    with open(labels_file, 'r') as f:
+        data = json.load(f)
+    regions = [tuple(region) for region in data['regions']]
+    frames = []
+    labels = []
+    for filename, texts in sorted(data['frames'].items()):
+        frame = cv2.imread(os.path.join(fixtures_dir, tool, filename))
+        if frame is not None:
+            frames.append(frame)
+            labels.append(texts)
+    if not frames:
+        return None
+    bbox = union_region(regions)
+    return Fixture(frames, (bbox[0], bbox[1]), regions, labels, recorded=True)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(durations: Sequence[float], peak: float = 0.0) -> dict:
+    return {
+        'runs': len(durations),
+        'p50_ms': percentile(durations, 50) * 1000,
+        'p95_ms': percentile(durations, 95) * 1000,
+        'mean_ms': sum(durations) / len(durations) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+def text_fixtures(fixtures_dir: str, frames: int, rng: np.random.Generator) -> Dict[str, Fixture]:
+    """Labelled text fixtures of the OCR tools, recorded ones where available."""
+    return {
+        'barter': load_recorded_fixture('barter', fixtures_dir)
+        or synthesize_text_fixture(BARTER_REGIONS, VENDOR_ITEMS, frames, rng),
+        'enchant': load_recorded_fixture('enchant', fixtures_dir)
+        or synthesize_text_fixture(ENCHANT_REGIONS, AFFIXES, frames, rng),
+        'masterwork': load_recorded_fixture('masterwork', fixtures_dir)
+        or synthesize_text_fixture([MASTERWORK_REGION], AFFIXES, frames, rng),
+    }
+
+
+class LabelResponder:
+    """Fake OCR that answers with the fixture label of each preprocessed region."""
+
+    def __init__(self):
+        self.texts: Dict[str, str] = {}
+
+    def add(self, image: np.ndarray, text: str) -> None:
+        self.texts[image_key(image)] = text
+
+    def __call__(self, image: np.ndarray, config: str) -> str:
+        return self.texts.get(image_key(image), '')
+
+
+def configure_ocr(mode: str, responder: LabelResponder) -> str:
+    engine = get_ocr_engine()
+    # A private cache, so a replay never touches the persisted OCR cache
+    engine.cache = OcrCache()
+    backend = None
+    if mode != 'fake':
+        try:
+            backend = create_backend(mode)
+        except Exception as e:
+            print(f"Tesseract unavailable ({e}), using fixture labels as OCR output")
+    engine.set_backend(backend or FakeBackend(responder))
+    return engine.backend.name
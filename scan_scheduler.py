@@ -0,0 +1,57 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+STOP_CHECK_INTERVAL = 0.05  # Seconds between stop checks while waiting on scans
+
+
+class ScanScheduler:
+    """Runs the region scans of a cycle on a bounded pool of worker threads."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='scan')
+
+    def first_hit(self, items: Sequence[T], scan: Callable[[T], R],
+                  accept: Callable[[R], bool],
+                  stop_event: Optional[threading.Event] = None) -> Tuple[List[R], Optional[int]]:
+        """Scan every item concurrently and stop at the lowest accepted index.
+
+        Returns the results up to and including the hit, the same list a
+        sequential loop that breaks on the first accepted result would have
+        produced. Scans that have not started yet are cancelled, and results of
+        ones still running are ignored. A set stop_event returns the results
+        so far without a hit.
+        """
+        futures = [self.executor.submit(scan, item) for item in items]
+        results = []
+        try:
+            for index, future in enumerate(futures):
+                while not future.done():
+                    if stop_event is not None and stop_event.is_set():
+                        return results, None
+                    wait(futures[index:], timeout=STOP_CHECK_INTERVAL if stop_event is not None else None,
+                         return_when=FIRST_COMPLETED)
+                result = future.result()
+                results.append(result)
+                if accept(result):
+                    return results, index
+            return results, None
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_scheduler = ScanScheduler()
+
+
+def get_scan_scheduler() -> ScanScheduler:
+    return _default_scheduler
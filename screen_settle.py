@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+import threading
+import time
+from typing import Optional, Tuple
+
+from frame_source import FrameSource, get_frame_source
+
+SAMPLE_WIDTH = 64  # Regions are compared as thumbnails at most this wide
+
+
+def region_signature(image: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    height, width = gray.shape[:2]
+    if width > SAMPLE_WIDTH:
+        size = (SAMPLE_WIDTH, max(1, height * SAMPLE_WIDTH // width))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return gray.astype(np.int16)
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    if a.shape != b.shape:
+        return float('inf')
+    return float(np.mean(np.abs(a - b)))
+
+
+class SettleDetector:
+    """Waits for the game UI to react to an input instead of sleeping a fixed time.
+
+    The configured delay becomes the timeout: a wait returns as soon as the
+    sampled region has changed from its pre-click state and then held still
+    for a few samples, or when the timeout runs out.
+    """
+
+    def __init__(self, frame_source: Optional[FrameSource] = None, enabled: bool = True,
+                 interval: float = 0.03, threshold: float = 2.0, stable_samples: int = 2,
+                 stop_event: Optional[threading.Event] = None):
+        self.frame_source = frame_source or get_frame_source()
+        self.enabled = enabled
+        self.interval = interval
+        self.threshold = threshold
+        self.stable_samples = stable_samples
+        self.stop_event = stop_event or threading.Event()
+
+    def sample(self, region: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        frame = self.frame_source.grab([region])
+        image = frame.region(region) if frame is not None else None
+        return region_signature(image) if image is not None else None
+
+    def sleep(self, timeout: float) -> bool:
+        """Plain delay; returns False if the process was stopped meanwhile."""
+        return not self.stop_event.wait(timeout)
+
+    def wait_for_update(self, region: Tuple[int, int, int, int], timeout: float,
+                        reference: Optional[np.ndarray] = None) -> bool:
+        """Wait until region differs from reference and is stable again.
+
+        Without a reference only stability is required. Returns True when the
+        UI settled, False on timeout or stop.
+        """
+        if not self.enabled:
+            self.sleep(timeout)
+            return False
+        deadline = time.perf_counter() + timeout
+        changed = reference is None
+        previous = reference
+        stable_count = 0
+        while True:
+            current = self.sample(region)
+            if current is not None and previous is not None:
+                if not changed:
+                    if frame_difference(current, reference) > self.threshold:
+                        changed = True
+                elif frame_difference(current, previous) <= self.threshold:
+                    stable_count += 1
+                    if stable_count >= self.stable_samples:
+                        return True
+                else:
+                    stable_count = 0
+            previous = current
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self.stop_event.wait(min(self.interval, remaining)):
+                return False
+
+    def wait_until_stable(self, region: Tuple[int, int, int, int], timeout: float) -> bool:
+        return self.wait_for_update(region, timeout)
+
+    def wait_until_changed(self, region: Tuple[int, int, int, int], timeout: float,
+                           reference: Optional[np.ndarray] = None) -> bool:
+        if not self.enabled:
+            self.sleep(timeout)
+            return False
+        reference = reference if reference is not None else self.sample(region)
+        deadline = time.perf_counter() + timeout
+        while True:
+            current = self.sample(region)
+            if current is not None and reference is not None and \
+                    frame_difference(current, reference) > self.threshold:
+                return True
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self.stop_event.wait(min(self.interval, remaining)):
+                return False
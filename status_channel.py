@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List
+
+STATUS_EVENT = '-STATUS-'
+STATUS_INTERVAL = 0.1  # GUI refresh tick while messages are arriving, 10 Hz
+MAX_PENDING = 200  # Messages kept between two ticks, older ones are counted and dropped
+CONSOLE_LINES = 500  # Lines kept in the output console
+
+
+def summarize(messages: List[str], dropped: int = 0) -> List[str]:
+    """Collapse runs of the same message into one line with a repeat count."""
+    lines = [f"... {dropped} older messages skipped"] if dropped else []
+    previous = None
+    count = 0
+    for message in messages + [None]:
+        if message == previous:
+            count += 1
+            continue
+        if previous is not None:
+            lines.append(previous if count == 1 else f"{previous} (x{count})")
+        previous = message
+        count = 1
+    return lines
+
+
+class StatusChannel:
+    """Status messages from a worker thread, handed to the GUI in batches.
+
+    post() only queues the message. The first message of a batch schedules a
+    single STATUS_EVENT for the window one tick later, so however fast a worker
+    posts, the GUI wakes at most once per tick and prints the whole batch.
+    """
+
+    def __init__(self, window, interval: float = STATUS_INTERVAL, max_pending: int = MAX_PENDING):
+        self.window = window
+        self.interval = interval
+        self.pending: Deque[str] = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.scheduled = False
+        self.closed = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='status-channel', daemon=True)
+        self.thread.start()
+
+    def post(self, message: object) -> None:
+        with self.lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(str(message))
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.wake.set()
+
+    def run(self) -> None:
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            if self.closed:
+                return
+            # Everything posted during this tick goes out with one GUI event
+            time.sleep(self.interval)
+            if self.closed:
+                return
+            try:
+                self.window.write_event_value(STATUS_EVENT, None)
+            except Exception as e:
+                logging.error(f"Error notifying window of status: {e}")
+
+    def drain(self) -> List[str]:
+        with self.lock:
+            messages = list(self.pending)
+            self.pending.clear()
+            dropped, self.dropped = self.dropped, 0
+            self.scheduled = False
+        return summarize(messages, dropped)
+
+    def close(self) -> None:
+        self.closed = True
+        self.wake.set()
+
+
+class OutputConsole:
+    """Output Multiline that keeps only the most recent lines."""
+
+    def __init__(self, element, max_lines: int = CONSOLE_LINES):
+        self.element = element
+        self.lines: Deque[str] = deque(maxlen=max_lines)
+        self.shown = 0  # Lines currently in the widget
+
+    def print(self, message: object) -> None:
+        self.write([str(message)])
+
+    def write(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        self.lines.extend(lines)
+        self.shown += len(lines)
+        if self.shown > self.lines.maxlen * 1.25:
+            # Rewriting the widget is costly, so it only happens once it is a quarter over
+            self.element.update('\n'.join(self.lines) + '\n')
+            self.shown = len(self.lines)
+        else:
+            self.element.print('\n'.join(lines))
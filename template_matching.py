@@ -0,0 +1,388 @@
+import cv2
+import numpy as np
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+
+MIN_COARSE_SIDE = 12  # Smallest template side worth matching at reduced scale
+COARSE_CANDIDATES = 3  # Coarse peaks refined at full resolution
+COARSE_SLACK = 0.15  # A coarse score this far below the confidence is not worth refining
+SCALE_STRIDE = 3  # Scales apart in the first coarse round over a pyramid
+BAND_ROWS = 96  # Result rows matched between two stop checks, a few ms on a full scan region
+SCALE_STEP = 1.05  # Ratio between neighbouring template scales, matching holds up to about half of it
+
+
+@dataclass
+class Template:
+    path: str
+    mtime: float
+    image: np.ndarray  # BGR, as loaded by cv2.imread
+    gray: np.ndarray
+    coarse: np.ndarray  # gray, downscaled by coarse_scale
+    coarse_scale: float
+    scale: float = 1.0  # Size relative to the captured file
+
+
+def make_template(path: str, mtime: float, image: np.ndarray, scale: float = 1.0) -> Template:
+    if scale != 1.0:
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    coarse_scale = coarse_scale_for(gray.shape)
+    return Template(path, mtime, image, gray, downscale(gray, coarse_scale), coarse_scale, scale)
+
+
+def scale_range(min_scale: float = 1.0, max_scale: float = 1.0) -> Tuple[float, ...]:
+    """Scales from min_scale to max_scale, SCALE_STEP apart and always including 1.0."""
+    scales = [1.0]
+    scale = 1.0
+    while scale / SCALE_STEP >= min_scale - 1e-9:
+        scale /= SCALE_STEP
+        scales.append(round(scale, 4))
+    scale = 1.0
+    while scale * SCALE_STEP <= max_scale + 1e-9:
+        scale *= SCALE_STEP
+        scales.append(round(scale, 4))
+    return tuple(sorted(scales))
+
+
+def coarse_scale_for(shape: Tuple[int, ...]) -> float:
+    side = min(shape[:2])
+    for scale in (0.25, 0.5):
+        if side * scale >= MIN_COARSE_SIDE:
+            return scale
+    return 1.0
+
+
+def downscale(image: np.ndarray, scale: float) -> np.ndarray:
+    if scale == 1.0:
+        return image
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+class TemplateCache:
+    """Decoded templates and their derived versions, reloaded when the file changes."""
+
+    def __init__(self):
+        self.templates: Dict[str, Template] = {}
+        self.pyramids: Dict[Tuple[str, Tuple[float, ...]], List[Template]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[Template]:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self.lock:
+            template = self.templates.get(path)
+            if template is not None and template.mtime == mtime:
+                return template
+        image = cv2.imread(path)
+        if image is None:
+            return None
+        template = make_template(path, mtime, image)
+        with self.lock:
+            self.templates[path] = template
+        return template
+
+    def pyramid(self, path: str, scales: Tuple[float, ...]) -> List[Template]:
+        """The template resized to every scale, built once per file version and scale range."""
+        template = self.get(path)
+        if template is None:
+            return []
+        with self.lock:
+            pyramid = self.pyramids.get((path, scales))
+            if pyramid is not None and pyramid[0].mtime == template.mtime:
+                return pyramid
+        pyramid = [template if scale == 1.0 else make_template(path, template.mtime, template.image, scale)
+                   for scale in scales]
+        with self.lock:
+            self.pyramids[(path, scales)] = pyramid
+        return pyramid
+
+    def clear(self) -> None:
+        with self.lock:
+            self.templates.clear()
+            self.pyramids.clear()
+
+
+def top_peaks(result: np.ndarray, count: int, radius: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Locations of the strongest peaks, suppressing the neighbourhood of each."""
+    result = result.copy()
+    peaks = []
+    for _ in range(count):
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val <= -1.0:
+            break
+        peaks.append(max_loc)
+        x, y = max_loc
+        result[max(0, y - radius[1]):y + radius[1] + 1, max(0, x - radius[0]):x + radius[0] + 1] = -1.0
+    return peaks
+
+
+def match_in_bands(image: np.ndarray, template: np.ndarray,
+                   stop_event: Optional[threading.Event] = None) -> Optional[np.ndarray]:
+    """cv2.matchTemplate in bands of rows, so a set stop_event ends it early with None.
+
+    Each result row depends only on the image rows under the template, so
+    the bands add up to the result of one call, up to float rounding.
+    """
+    if stop_event is None:
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    h = template.shape[0]
+    rows = image.shape[0] - h + 1
+    result = np.empty((rows, image.shape[1] - template.shape[1] + 1), np.float32)
+    for start in range(0, rows, BAND_ROWS):
+        if stop_event.is_set():
+            return None
+        end = min(rows, start + BAND_ROWS)
+        result[start:end] = cv2.matchTemplate(image[start:end + h - 1], template, cv2.TM_CCOEFF_NORMED)
+    return result
+
+
+class FramePyramid:
+    """Grayscale and downscaled versions of one frame, computed once and shared by every template."""
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self._gray = None
+        self.levels: Dict[float, np.ndarray] = {}
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def level(self, scale: float) -> np.ndarray:
+        if scale not in self.levels:
+            self.levels[scale] = downscale(self.gray, scale)
+        return self.levels[scale]
+
+
+def refine_match(image: np.ndarray, template: Template, coarse_loc: Tuple[int, int],
+                 scale: Optional[float] = None) -> Optional[Tuple[float, Tuple[int, int]]]:
+    """Full resolution colour match in a small window around a peak found at scale, coarse_scale by default."""
+    h, w = template.image.shape[:2]
+    scale = scale or template.coarse_scale
+    # A coarse pixel spans 1/scale full pixels and its peak can be off by one either way
+    pad = 2 * int(np.ceil(1.0 / scale)) + 2
+    x0 = max(0, int(coarse_loc[0] / scale) - pad)
+    y0 = max(0, int(coarse_loc[1] / scale) - pad)
+    x1 = min(image.shape[1], int(coarse_loc[0] / scale) + w + pad)
+    y1 = min(image.shape[0], int(coarse_loc[1] / scale) + h + pad)
+    window = image[y0:y1, x0:x1]
+    if window.shape[0] < h or window.shape[1] < w:
+        return None
+    result = cv2.matchTemplate(window, template.image, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, (x0 + max_loc[0], y0 + max_loc[1])
+
+
+def match_templates(image: np.ndarray, templates: Sequence[Template],
+                    pyramid: Optional[FramePyramid] = None,
+                    stop_event: Optional[threading.Event] = None,
+                    confidence: Optional[float] = None
+                    ) -> Optional[Tuple[float, Tuple[int, int], Template]]:
+    """Best TM_CCOEFF_NORMED score, top-left position and template over a set of templates.
+
+    Every template is scored at reduced scale against the same grayscale
+    pyramid of the frame. Only the strongest coarse peaks across all
+    templates are refined at full resolution, so the expensive pass does not
+    grow with the number of templates. The score is always the full
+    resolution colour score. A set stop_event ends the search with None.
+
+    With a confidence, a template whose coarse peak comes within
+    COARSE_SLACK of it is refined right away, and the first match that
+    reaches it is returned without scoring the remaining templates. If
+    refining falls short, those templates get one exhaustive full
+    resolution pass before the search reports a miss.
+    """
+    pyramid = pyramid or FramePyramid(image)
+    best, near = coarse_to_fine(image, templates, pyramid, stop_event, confidence)
+    if near and (best is None or best[0] < confidence):
+        return exhaustive_match(image, pyramid, near, confidence, best, stop_event)
+    return best
+
+
+def coarse_to_fine(image: np.ndarray, templates: Sequence[Template],
+                   pyramid: Optional[FramePyramid] = None,
+                   stop_event: Optional[threading.Event] = None,
+                   confidence: Optional[float] = None
+                   ) -> Tuple[Optional[Tuple[float, Tuple[int, int], Template]], List[Template]]:
+    """match_templates without the exhaustive pass: the best match and the templates it would search."""
+    pyramid = pyramid or FramePyramid(image)
+    best = None
+    candidates = []
+    near = []
+    for template in templates:
+        h, w = template.image.shape[:2]
+        if image.shape[0] < h or image.shape[1] < w:
+            continue
+        if template.coarse_scale == 1.0:
+            # Too small to downscale, match directly
+            result = match_in_bands(image, template.image, stop_event)
+            if result is None:
+                return None, []
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if best is None or max_val > best[0]:
+                best = (max_val, max_loc, template)
+            continue
+        coarse_result = match_in_bands(pyramid.level(template.coarse_scale), template.coarse, stop_event)
+        if coarse_result is None:
+            return None, []
+        coarse_h, coarse_w = template.coarse.shape[:2]
+        peaks = [(float(coarse_result[peak[1], peak[0]]), peak, template)
+                 for peak in top_peaks(coarse_result, COARSE_CANDIDATES, (coarse_w // 2, coarse_h // 2))]
+        if confidence is not None and peaks and peaks[0][0] >= confidence - COARSE_SLACK:
+            best = refine_candidates(image, peaks, confidence, best)
+            if best is not None and best[0] >= confidence:
+                return best, []
+            near.append(template)
+            continue
+        candidates.extend(peaks)
+
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    for _, peak, template in candidates[:COARSE_CANDIDATES]:
+        match = refine_match(image, template, peak)
+        if match is not None and (best is None or match[0] > best[0]):
+            best = (match[0], match[1], template)
+    return best, near
+
+
+def coarse_candidates(pyramid: FramePyramid, template: Template,
+                      stop_event: Optional[threading.Event] = None) -> List[Tuple[float, Tuple[int, int], Template]]:
+    coarse_result = match_in_bands(pyramid.level(template.coarse_scale), template.coarse, stop_event)
+    if coarse_result is None:
+        return []
+    coarse_h, coarse_w = template.coarse.shape[:2]
+    return [(float(coarse_result[peak[1], peak[0]]), peak, template)
+            for peak in top_peaks(coarse_result, COARSE_CANDIDATES, (coarse_w // 2, coarse_h // 2))]
+
+
+def refine_candidates(image: np.ndarray, candidates: List[Tuple[float, Tuple[int, int], Template]],
+                      confidence: float, best: Optional[Tuple[float, Tuple[int, int], Template]] = None
+                      ) -> Optional[Tuple[float, Tuple[int, int], Template]]:
+    """Refine the strongest coarse candidates, best first, until one reaches confidence."""
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    for score, peak, template in candidates[:COARSE_CANDIDATES]:
+        if score < confidence - COARSE_SLACK:
+            break
+        match = refine_match(image, template, peak)
+        if match is not None and (best is None or match[0] > best[0]):
+            best = (match[0], match[1], template)
+            if best[0] >= confidence:
+                break
+    return best
+
+
+def exhaustive_match(image: np.ndarray, pyramid: FramePyramid, templates: Sequence[Template], confidence: float,
+                     best: Optional[Tuple[float, Tuple[int, int], Template]] = None,
+                     stop_event: Optional[threading.Event] = None
+                     ) -> Optional[Tuple[float, Tuple[int, int], Template]]:
+    """Full resolution match over the whole image, for templates whose coarse peaks came close.
+
+    Refining only looks around the coarse peaks, so a match the downscale
+    blurred or shifted is still found before a miss is reported. The pass
+    is grayscale, more than ten times faster than colour, and its best
+    peaks are refined in colour like the coarse ones.
+    """
+    for template in templates:
+        result = match_in_bands(pyramid.gray, template.gray, stop_event)
+        if result is None:
+            return None
+        h, w = template.gray.shape[:2]
+        for peak in top_peaks(result, COARSE_CANDIDATES, (w // 2, h // 2)):
+            match = refine_match(image, template, peak, 1.0)
+            if match is not None and (best is None or match[0] > best[0]):
+                best = (match[0], match[1], template)
+                if best[0] >= confidence:
+                    return best
+    return best
+
+
+def match_templates_multiscale(image: np.ndarray, pyramids: Sequence[Sequence[Template]], confidence: float,
+                               pyramid: Optional[FramePyramid] = None,
+                               stop_event: Optional[threading.Event] = None
+                               ) -> Optional[Tuple[float, Tuple[int, int], Template]]:
+    """match_templates over every scale of each template pyramid, stopping once confidence is reached.
+
+    The captured scale goes first, so a match there costs no more than
+    match_templates. Then every SCALE_STRIDE-th scale is scored at coarse
+    resolution and its best peaks refined; only if that falls short are
+    the scales around the best sample scored, and if refining still falls
+    short the captured and best sampled scales that came within
+    COARSE_SLACK get one exhaustive full resolution pass.
+    Coarse scores more than COARSE_SLACK below confidence end the search,
+    so a frame without a match costs a few coarse passes, not one per
+    scale. A set stop_event
+    is checked between scales and ends the search without a match.
+    """
+    pyramid = pyramid or FramePyramid(image)
+    originals = [template for scaled in pyramids for template in scaled if template.scale == 1.0]
+    best, near = coarse_to_fine(image, originals, pyramid, stop_event, confidence) if originals else (None, [])
+    if best is not None and best[0] >= confidence:
+        return best
+
+    def fits(template: Template) -> bool:
+        return image.shape[0] >= template.image.shape[0] and image.shape[1] >= template.image.shape[1]
+
+    def stopped() -> bool:
+        return stop_event is not None and stop_event.is_set()
+
+    candidates = []
+    sampled = []
+    for scaled in pyramids:
+        center = next((i for i, template in enumerate(scaled) if template.scale == 1.0), len(scaled) // 2)
+        scores = {}
+        for i in range(center % SCALE_STRIDE, len(scaled), SCALE_STRIDE):
+            if stopped():
+                return None
+            if i != center and fits(scaled[i]):
+                results = coarse_candidates(pyramid, scaled[i], stop_event)
+                candidates.extend(results)
+                scores[i] = max((candidate[0] for candidate in results), default=-1.0)
+        sampled.append((scaled, center, scores))
+    best = refine_candidates(image, candidates, confidence, best)
+    if stopped():
+        return None
+    if best is not None and best[0] >= confidence:
+        return best
+
+    # Fill in the scales between the best sample and its neighbours
+    candidates = []
+    for scaled, center, scores in sampled:
+        if not scores or max(scores.values()) < confidence - COARSE_SLACK:
+            continue
+        top = max(scores, key=scores.get)
+        for i in range(max(0, top - SCALE_STRIDE + 1), min(len(scaled), top + SCALE_STRIDE)):
+            if stopped():
+                return None
+            if i != center and i not in scores and fits(scaled[i]):
+                candidates.extend(coarse_candidates(pyramid, scaled[i], stop_event))
+    best = refine_candidates(image, candidates, confidence, best)
+    if stopped():
+        return None
+    if best is None or best[0] < confidence:
+        for scaled, center, scores in sampled:
+            if scores and max(scores.values()) >= confidence - COARSE_SLACK:
+                near.append(scaled[max(scores, key=scores.get)])
+        if near:
+            best = exhaustive_match(image, pyramid, near, confidence, best, stop_event)
+    return best
+
+
+def match_template(image: np.ndarray, template: Template) -> Optional[Tuple[float, Tuple[int, int]]]:
+    """Best TM_CCOEFF_NORMED score and top-left position of template in a BGR image."""
+    match = match_templates(image, [template])
+    if match is None:
+        return None
+    return match[0], match[1]
+
+
+_default_cache = TemplateCache()
+
+
+def get_template_cache() -> TemplateCache:
+    return _default_cache
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from matcher import TargetMatcher, compile_targets, flexible_match, reference_flexible_match
+
+TEXTS = [
+    '',
+    '   ',
+    'Legendary Amulet',
+    'LEGENDARY  amulet of\tthe Magi',
+    'Sigil Powder x12',
+    'obducite',
+    'Obdu cite',
+    'Forgotten Soul',
+    'forgot soul',
+    'ring of 2 aa',
+    'Veiled Crystal Veiled',
+    '+12.5% Critical Strike Chance',
+    'critical strike damage',
+    'Strik',
+    'ch',
+]
+
+
+def assert_compatible(targets, text):
+    matcher = TargetMatcher(targets)
+    expected = tuple(i for i, target in enumerate(targets) if reference_flexible_match(target, text))
+    assert matcher.matches(text) == expected, (targets, text)
+    assert matcher.first_match(text) == (targets[expected[0]] if expected else None), (targets, text)
+
+
+@pytest.mark.parametrize('target', ['', '   ', '\t\n'])
+@pytest.mark.parametrize('text', TEXTS)
+def test_empty_target(target, text):
+    assert_compatible([target], text)
+
+
+@pytest.mark.parametrize('target', ['veiled veiled', 'Veiled Crystal veiled', 'of of'])
+@pytest.mark.parametrize('text', TEXTS)
+def test_repeated_words(target, text):
+    assert_compatible([target], text)
+
+
+@pytest.mark.parametrize('target', ['of', 'a', 'x1', 'ring of', 'ch', 'aa 2'])
+@pytest.mark.parametrize('text', TEXTS)
+def test_short_words(target, text):
+    assert_compatible([target], text)
+
+
+@pytest.mark.parametrize('target, text', [
+    # max(3, n // 2): 8 letters need a shared 4-gram, 6 letters a 3-gram
+    ('obducite', 'obdu'),
+    ('obducite', 'obd'),
+    ('obducite', 'xxducixx'),
+    ('crystal', 'rys'),
+    ('crystal', 'ry'),
+    ('legendary', 'gend'),
+    ('legendary', 'gen'),
+    ('abcdefghijklmnop', 'ghijkl'),
+    ('abcdefghijklmnop', 'ghijklm'),
+    ('abcdefghijklmnop', 'hijklmnopq'),
+])
+def test_partial_ngram_length(target, text):
+    assert_compatible([target], text)
+
+
+@pytest.mark.parametrize('target', ['Legendary Amulet', 'LEGENDARY', 'sIgIl PoWdEr', 'Critical STRIKE'])
+@pytest.mark.parametrize('text', TEXTS)
+def test_mixed_case(target, text):
+    assert_compatible([target], text)
+
+
+def test_first_match_follows_config_order():
+    targets = ['Strike Damage', 'Critical Strike', 'Strike']
+    matcher = TargetMatcher(targets)
+    assert matcher.matches('critical strike damage') == (0, 1, 2)
+    assert matcher.first_match('critical strike damage') == 'Strike Damage'
+    assert TargetMatcher(list(reversed(targets))).first_match('critical strike damage') == 'Strike'
+    assert matcher.first_match('critical strike chance') == 'Critical Strike'
+    assert matcher.first_match('nothing here') is None
+
+
+def test_memo_returns_same_result():
+    matcher = TargetMatcher(['Forgotten Soul'], memo_size=2)
+    for text in TEXTS * 2:
+        assert matcher.matches(text) == ((0,) if reference_flexible_match('Forgotten Soul', text) else ())
+
+
+def test_flexible_match_and_compiled_targets():
+    assert compile_targets(['a', 'b']) is compile_targets(['a', 'b'])
+    for text in TEXTS:
+        assert flexible_match('Veiled Crystal', text) == reference_flexible_match('Veiled Crystal', text)
+
+
+def test_random_targets_and_texts():
+    rng = random.Random(5)
+    alphabet = 'abcde '
+    for _ in range(300):
+        targets = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(rng.randint(1, 4))]
+        text = ''.join(rng.choice(alphabet + 'ABC\t') for _ in range(rng.randint(0, 20)))
+        assert_compatible(targets, text)
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from screen_settle import frame_difference, region_signature
+
+Box = Tuple[int, int, int, int]  # x, y, width, height inside the region image
+
+LINE_PADDING = 4  # Pixels kept around the detected text, Tesseract needs some margin
+MIN_LINE_HEIGHT = 6  # Thinner bands are borders and separators, not text
+MIN_CONTRAST = 24  # Regions whose strongest edge is weaker than this hold no text
+LAYOUT_THRESHOLD = 4.0  # Thumbnail difference still treated as the same layout
+
+_GRADIENT_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+_LINE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3))
+
+
+def find_text_lines(image: np.ndarray) -> List[Box]:
+    """Boxes of the text lines in a region, from edge density projection profiles."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    # Glyph strokes have strong local contrast whatever the text and background colours
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, _GRADIENT_KERNEL)
+    if gradient.max() < MIN_CONTRAST:
+        return []
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Join the characters of a line into one horizontal band
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, _LINE_KERNEL)
+
+    height, width = binary.shape[:2]
+    row_counts = np.count_nonzero(binary, axis=1)
+    text_rows = row_counts > max(2, width // 100)
+    # Start and end row of every run of text rows
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], text_rows.view(np.int8), [0]))))
+    lines = []
+    for top, bottom in zip(edges[::2], edges[1::2]):
+        if bottom - top < MIN_LINE_HEIGHT:
+            continue
+        columns = np.flatnonzero(np.count_nonzero(binary[top:bottom], axis=0))
+        left, right = columns[0], columns[-1] + 1
+        x0 = max(0, left - LINE_PADDING)
+        y0 = max(0, top - LINE_PADDING)
+        x1 = min(width, right + LINE_PADDING)
+        y1 = min(height, bottom + LINE_PADDING)
+        lines.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+    return lines
+
+
+def text_bounds(image: np.ndarray) -> Optional[Box]:
+    """Smallest box around every text line, None when no text was found."""
+    lines = find_text_lines(image)
+    if not lines:
+        return None
+    x0 = min(line[0] for line in lines)
+    y0 = min(line[1] for line in lines)
+    x1 = max(line[0] + line[2] for line in lines)
+    y1 = max(line[1] + line[3] for line in lines)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+class TextRoiCache:
+    """Text crop box per scan region, reused while the region keeps the same layout.
+
+    A region is recognised by a small grayscale thumbnail; as long as a new
+    capture stays within threshold of it, the earlier box is used without
+    running line detection again.
+    """
+
+    def __init__(self, threshold: float = LAYOUT_THRESHOLD):
+        self.threshold = threshold
+        self.entries: Dict[Tuple[int, int, int, int], Tuple[np.ndarray, Optional[Box]]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.input_area = 0
+        self.cropped_area = 0
+
+    def crop_box(self, region: Tuple[int, int, int, int], image: np.ndarray) -> Optional[Box]:
+        signature = region_signature(image)
+        region = tuple(region)  # Regions loaded from JSON are lists
+        with self.lock:
+            entry = self.entries.get(region)
+        if entry is not None and frame_difference(entry[0], signature) <= self.threshold:
+            with self.lock:
+                self.hits += 1
+            return entry[1]
+        box = text_bounds(image)
+        with self.lock:
+            self.misses += 1
+            self.entries[region] = (signature, box)
+        return box
+
+    def crop(self, region: Tuple[int, int, int, int], image: np.ndarray) -> np.ndarray:
+        """The text lines of a region image; the whole image when none were found."""
+        box = self.crop_box(region, image)
+        cropped = image if box is None else image[box[1]:box[1] + box[3], box[0]:box[0] + box[2]]
+        with self.lock:
+            self.input_area += image.shape[0] * image.shape[1]
+            self.cropped_area += cropped.shape[0] * cropped.shape[1]
+        return cropped
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'area_ratio': self.cropped_area / self.input_area if self.input_area else 1.0,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,151 @@
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from frame_source import Frame, get_frame_source
+from instrumentation import Metrics, span
+from ocr_engine import OcrEngine, OcrResult, get_ocr_engine
+from preprocess import PreprocessPipeline, get_preprocess_pipeline
+from text_roi import TextRoiCache
+
+Region = Tuple[int, int, int, int]
+
+
+def region_image(frame: Frame, region: Region, roi: Optional[TextRoiCache] = None):
+    image = frame.region(region)
+    if image is not None and roi is not None:
+        # Only the detected text lines go to OCR
+        image = roi.crop(region, image)
+    return image
+
+
+def scan_for_text(region: Region, frame: Optional[Frame] = None, ocr: Optional[OcrEngine] = None,
+                  roi: Optional[TextRoiCache] = None, pipeline: Optional[PreprocessPipeline] = None,
+                  ocr_config: str = '', metrics: Optional[Metrics] = None) -> str:
+    """OCR text of one region, grabbed now unless it comes from an earlier frame."""
+    if frame is None:
+        with span(metrics, 'capture'):
+            frame = get_frame_source().grab([region])
+    if frame is None:
+        return ""
+    with span(metrics, 'preprocess'):
+        image = region_image(frame, region, roi)
+        if image is None:
+            return ""
+        processed_image = (pipeline or get_preprocess_pipeline()).process(image, frame.channels, tuple(region))
+    try:
+        with span(metrics, 'ocr'):
+            text = (ocr or get_ocr_engine()).image_to_string(processed_image, ocr_config)
+        return text.strip()
+    except Exception as e:
+        logging.error(f"Error scanning for text: {e}")
+        return ""
+
+
+def scan_for_text_batch(regions: Sequence[Region], frame: Frame, ocr: Optional[OcrEngine] = None,
+                        roi: Optional[TextRoiCache] = None,
+                        pipeline: Optional[PreprocessPipeline] = None, ocr_config: str = '',
+                        metrics: Optional[Metrics] = None) -> List[str]:
+    """OCR text of every region of a frame, preprocessed and recognised as one batch."""
+    with span(metrics, 'preprocess'):
+        images = [region_image(frame, region, roi) for region in regions]
+        processed_images = (pipeline or get_preprocess_pipeline()).process_batch(
+            images, frame.channels, [tuple(region) for region in regions])
+    valid_indices = [i for i, image in enumerate(processed_images) if image is not None]
+    texts = [""] * len(regions)
+    try:
+        with span(metrics, 'ocr'):
+            batch_texts = (ocr or get_ocr_engine()).image_to_strings(
+                [processed_images[i] for i in valid_indices], ocr_config)
+        for i, text in zip(valid_indices, batch_texts):
+            texts[i] = text.strip()
+    except Exception as e:
+        logging.error(f"Error scanning for text: {e}")
+    return texts
+
+
+def needs_rescan(result: OcrResult, rescan_below: float) -> bool:
+    confidence = result.confidence
+    return rescan_below > 0 and confidence is not None and confidence < rescan_below
+
+
+def rescan_region(image, channels: str, region: Region, result: OcrResult, ocr: OcrEngine,
+                  pipeline: PreprocessPipeline, ocr_config: str = '',
+                  metrics: Optional[Metrics] = None) -> OcrResult:
+    """Read a doubtful region again with other preprocessing and keep the more confident result."""
+    with span(metrics, 'preprocess'):
+        processed_image = pipeline.process(image, channels, tuple(region))
+    with span(metrics, 'ocr'):
+        second = ocr.image_to_result(processed_image, ocr_config)
+    if metrics is not None:
+        metrics.count('ocr_rescans')
+    if second.confidence is not None and second.confidence > result.confidence:
+        return second
+    return result
+
+
+def scan_for_result(region: Region, frame: Optional[Frame] = None, ocr: Optional[OcrEngine] = None,
+                    roi: Optional[TextRoiCache] = None, pipeline: Optional[PreprocessPipeline] = None,
+                    ocr_config: str = '', metrics: Optional[Metrics] = None, rescan_below: float = 0.0,
+                    rescan_pipeline: Optional[PreprocessPipeline] = None, words: bool = True) -> OcrResult:
+    """scan_for_text with word confidences, or just the text when words is False.
+
+    A region whose least certain word is below rescan_below is read once more
+    through rescan_pipeline; regions read confidently are never OCR'd twice.
+    """
+    if frame is None:
+        with span(metrics, 'capture'):
+            frame = get_frame_source().grab([region])
+    if frame is None:
+        return OcrResult("")
+    with span(metrics, 'preprocess'):
+        image = region_image(frame, region, roi)
+        if image is None:
+            return OcrResult("")
+        processed_image = (pipeline or get_preprocess_pipeline()).process(image, frame.channels, tuple(region))
+    ocr = ocr or get_ocr_engine()
+    try:
+        if not words:
+            # Nothing needs the confidences, the plain text read is cheaper
+            with span(metrics, 'ocr'):
+                return OcrResult(ocr.image_to_string(processed_image, ocr_config).strip())
+        with span(metrics, 'ocr'):
+            result = ocr.image_to_result(processed_image, ocr_config)
+        if rescan_pipeline is not None and needs_rescan(result, rescan_below):
+            result = rescan_region(image, frame.channels, region, result, ocr, rescan_pipeline, ocr_config, metrics)
+        return result
+    except Exception as e:
+        logging.error(f"Error scanning for text: {e}")
+        return OcrResult("")
+
+
+def scan_for_results_batch(regions: Sequence[Region], frame: Frame, ocr: Optional[OcrEngine] = None,
+                           roi: Optional[TextRoiCache] = None,
+                           pipeline: Optional[PreprocessPipeline] = None, ocr_config: str = '',
+                           metrics: Optional[Metrics] = None, rescan_below: float = 0.0,
+                           rescan_pipeline: Optional[PreprocessPipeline] = None,
+                           words: bool = True) -> List[OcrResult]:
+    """scan_for_text_batch with word confidences; only the doubtful regions are read again, one by one."""
+    with span(metrics, 'preprocess'):
+        images = [region_image(frame, region, roi) for region in regions]
+        processed_images = (pipeline or get_preprocess_pipeline()).process_batch(
+            images, frame.channels, [tuple(region) for region in regions])
+    valid_indices = [i for i, image in enumerate(processed_images) if image is not None]
+    results = [OcrResult("") for _ in regions]
+    ocr = ocr or get_ocr_engine()
+    try:
+        if not words:
+            with span(metrics, 'ocr'):
+                batch_texts = ocr.image_to_strings([processed_images[i] for i in valid_indices], ocr_config)
+            for i, text in zip(valid_indices, batch_texts):
+                results[i] = OcrResult(text.strip())
+            return results
+        with span(metrics, 'ocr'):
+            batch_results = ocr.image_to_results([processed_images[i] for i in valid_indices], ocr_config)
+        for i, result in zip(valid_indices, batch_results):
+            if rescan_pipeline is not None and needs_rescan(result, rescan_below):
+                result = rescan_region(images[i], frame.channels, regions[i], result, ocr, rescan_pipeline,
+                                       ocr_config, metrics)
+            results[i] = result
+    except Exception as e:
+        logging.error(f"Error scanning for text: {e}")
+    return results
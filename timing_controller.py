@@ -0,0 +1,132 @@
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from instrumentation import Metrics
+from screen_settle import SettleDetector
+
+TIMING_FILES = {
+    'barter': 'restock_timing.json',
+    'enchant': 'enchant_timing.json',
+    'masterwork': 'upgrade_timing.json',
+    'kurast': 'kurast_timing.json',
+}
+SAMPLES = 30  # Recent latencies kept per action
+WARMUP = 5  # Verified waits in a row before a delay shrinks
+MARGIN = 0.5  # The delay stays this fraction above the slow end of the measured latencies
+MIN_MARGIN = 0.05  # ...and at least this many seconds above it
+MIN_DELAY = 0.1
+SHRINK = 0.8  # A delay drops at most this much per verified wait, so it approaches the latency gradually
+BACKOFF = 2.0  # A wait that timed out doubles its delay, up to the configured one
+
+
+@dataclass
+class ActionTiming:
+    delay: float = 0.0  # Learned timeout in seconds, 0 until the action has been measured
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=SAMPLES))
+    streak: int = 0  # Verified waits since the last timeout
+    verified: int = 0
+    failed: int = 0
+
+    def target(self) -> float:
+        slow = float(np.percentile(self.latencies, 95))
+        return max(MIN_DELAY, slow + max(slow * MARGIN, MIN_MARGIN))
+
+    def to_dict(self) -> dict:
+        return {'delay': self.delay, 'latencies': list(self.latencies),
+                'verified': self.verified, 'failed': self.failed}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ActionTiming':
+        timing = cls(delay=float(data.get('delay', 0.0)),
+                     verified=int(data.get('verified', 0)), failed=int(data.get('failed', 0)))
+        timing.latencies.extend(float(value) for value in data.get('latencies', []))
+        # Shrinking resumes only after this run has confirmed the saved delay
+        return timing
+
+
+class TimingController:
+    """Learns how long each click really takes to show on screen.
+
+    Every wait after a click is timed from the click until the screen has
+    changed and settled again. Once an action has verified WARMUP times in a
+    row, its timeout shrinks toward the slow end of those latencies plus a
+    margin; a wait that times out backs off toward the configured delay,
+    which always stays the upper bound. Learned delays are kept per tool
+    and only applied while the screen is sampled to confirm each wait.
+    """
+
+    def __init__(self, tool: str, settle: SettleDetector, enabled: bool = True,
+                 metrics: Optional[Metrics] = None):
+        self.tool = tool
+        self.path = TIMING_FILES.get(tool, f'{tool}_timing.json')
+        self.settle = settle
+        self.enabled = enabled
+        self.metrics = metrics
+        self.actions: Dict[str, ActionTiming] = {}
+        if enabled:
+            self.load()
+
+    def delay(self, action: str, timeout: float) -> float:
+        """The learned timeout of action, or timeout while nothing watches the screen to confirm it."""
+        timing = self.actions.get(action)
+        if not self.enabled or not self.settle.enabled or timing is None or not timing.delay:
+            return timeout
+        return min(timing.delay, timeout)
+
+    def wait(self, action: str, region: Tuple[int, int, int, int], timeout: float,
+             reference: Optional[np.ndarray] = None) -> bool:
+        """settle.wait_for_update with the learned timeout of this action."""
+        delay = self.delay(action, timeout)
+        start = time.perf_counter()
+        settled = self.settle.wait_for_update(region, delay, reference)
+        # Without screen sampling this is a plain sleep of the configured delay, nothing is measured
+        if self.enabled and self.settle.enabled and not self.settle.stop_event.is_set():
+            self.observe(action, time.perf_counter() - start if settled else None, timeout)
+        return settled
+
+    def observe(self, action: str, latency: Optional[float], timeout: float) -> None:
+        """Account one wait: the seconds until the screen settled, or None when it timed out."""
+        timing = self.actions.setdefault(action, ActionTiming())
+        current = timing.delay or timeout
+        if latency is None:
+            timing.failed += 1
+            timing.streak = 0
+            timing.delay = min(timeout, current * BACKOFF)
+            if self.metrics is not None:
+                self.metrics.count('timing_backoffs')
+            return
+        timing.verified += 1
+        timing.streak += 1
+        timing.latencies.append(latency)
+        if timing.streak >= WARMUP:
+            timing.delay = min(timeout, max(timing.target(), current * SHRINK))
+
+    def summary(self) -> str:
+        return ', '.join(f"{action} {timing.delay:.2f} s" for action, timing in self.actions.items()
+                         if timing.delay)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.actions = {action: ActionTiming.from_dict(values) for action, values in data.items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Error loading {self.path}: {e}")
+
+    def save(self) -> None:
+        if not self.enabled or not self.actions:
+            return
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({action: timing.to_dict() for action, timing in self.actions.items()}, f, indent=2)
+            logging.info(f"Learned delays for {self.tool}: {self.summary() or 'none yet'}")
+        except Exception as e:
+            logging.error(f"Error saving {self.path}: {e}")